@@ -0,0 +1,68 @@
+"""
+Headless entrypoint for computing features over many analyses without the
+Streamlit app. Each analysis directory needs its EDF and the EDFconfig.json
+saved from the "Create or Edit Analysis" page. Outputs are written to
+`<analysis>/features`; rerunning skips features that were
+already written from the same EDFs and settings.
+
+    python batch.py                      # every analysis in the filestore
+    python batch.py seal_01 seal_02 -j 8
+"""
+import argparse
+import os
+import sys
+import config as cfg
+from utils.AnalysisStore import AnalysisStore
+from utils.FeatureRunner import run_batch
+
+
+def print_analysis(summary) -> None:
+    print(f"[{summary['analysis']}] computed={summary['computed']} "
+          f"skipped={summary['skipped']} failed={summary['failed']} "
+          f"time={summary['seconds']:.1f}s", flush=True)
+    for error in summary['errors']:
+        print(f"    {error.strip()}", flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=f"{cfg.APP_NAME} batch feature runner")
+    parser.add_argument('analyses', nargs='*',
+                        help='analysis names to process (default: all analyses in the store)')
+    parser.add_argument('--store', default=cfg.ANALYSIS_STORE,
+                        help='directory containing the analysis folders')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: CPU count)')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='recompute features even if their output already exists')
+    parser.add_argument('--qc', action='store_true',
+                        help='scan analyses for artifacts first, features then skip flagged windows')
+    args = parser.parse_args(argv)
+    # silence mne's per-read header chatter, inherited by the worker processes
+    os.environ.setdefault('MNE_LOGGING_LEVEL', 'WARNING')
+
+    analyses = args.analyses or sorted(AnalysisStore.get_existing_analyses(args.store))
+    if not analyses:
+        print(f"No analyses found in '{args.store}'")
+        return 1
+
+    result = run_batch(
+        analyses,
+        store=args.store,
+        workers=args.workers,
+        overwrite=args.overwrite,
+        on_complete=print_analysis,
+        qc=args.qc
+    )
+    print(
+        f"\n{len(analyses)} analyses in {result['wall_seconds']:.1f}s wall "
+        f"({result['cpu_seconds']:.1f}s summed worker time)\n"
+        f"features: {result['computed']} computed, {result['skipped']} skipped, "
+        f"{result['failed']} failed\n"
+        f"throughput: {result['features_per_sec']:.2f} features/s, "
+        f"{result['samples_per_sec'] / 1e6:.2f} Msamples/s"
+    )
+    return 1 if result['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
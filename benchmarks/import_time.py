@@ -0,0 +1,79 @@
+"""
+Import-time regression check for the Streamlit pages.
+
+Each page's top-level imports are replayed in a fresh interpreter, which is
+what a cold Streamlit server pays before first paint. The check fails if a
+page takes longer than the budget or pulls in one of the heavy scientific
+stacks, which should only be imported once a computation needs them.
+
+    python benchmarks/import_time.py [--budget 1.0] [--repeat 3]
+"""
+import argparse
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('mne', 'scipy', 'sleepecg', 'wfdb', 'pandas')
+
+TIMER = """
+import sys, time
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed, ','.join(heavy))
+"""
+
+
+def get_page_imports(path) -> str:
+    """
+    Returns the top-level import statements of a page script as source code
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return '\n'.join(ast.unparse(node) for node in imports)
+
+
+def time_imports(imports, repeat) -> tuple:
+    """
+    Runs the imports in `repeat` fresh interpreters, returns the best time
+    and the heavy modules that ended up loaded.
+    """
+    code = TIMER.format(imports=imports, heavy=HEAVY_MODULES)
+    best, heavy = float('inf'), []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        elapsed, loaded = out.split(' ', 1) if ' ' in out else (out, '')
+        best = min(best, float(elapsed))
+        heavy = [m for m in loaded.split(',') if m]
+    return best, heavy
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget', type=float, default=1.0,
+                        help='maximum cold import time per page in seconds')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='fresh interpreters per page, the best time is kept')
+    args = parser.parse_args(argv)
+
+    pages = [os.path.join(ROOT, 'Home.py')] + sorted(glob.glob(os.path.join(ROOT, 'pages', '*.py')))
+    failed = False
+    for page in pages:
+        elapsed, heavy = time_imports(get_page_imports(page), args.repeat)
+        ok = elapsed <= args.budget and not heavy
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {elapsed:6.3f}s  {os.path.relpath(page, ROOT)}"
+              + (f"  (loaded: {', '.join(heavy)})" if heavy else ''))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
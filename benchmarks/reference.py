@@ -0,0 +1,118 @@
+"""
+Frozen reference implementations of the Channel features, used as oracles by
+verify_fast_paths.py. These are copies of the original per-window
+implementations (the `_apply_rolling` closures and the dense heart rate loop)
+and should not be optimised: their whole point is to stay slow and obvious.
+"""
+import numpy as np
+
+
+def apply_rolling(signal, freq, window_sec, step_size, process) -> np.array:
+    window_length = window_sec * freq
+    step_idx = int(step_size * freq)
+
+    accum = []
+    for i in range(0, len(signal), step_idx):
+        window_start = i - window_length//2
+        window_end = i + window_length//2
+        if window_start < 0:
+            accum.append(np.nan)
+        elif window_end > len(signal):
+            accum.append(np.nan)
+        else:
+            accum.append(process(signal, window_start, window_end))
+    return np.array(accum, dtype=np.float64)
+
+
+def rolling_zero_crossings(signal, freq, window_sec=1, step_size=1) -> np.array:
+    def get_crossing(a, start, end):
+        return ((a[start:end-1] * a[start+1:end]) < 0).sum()
+    return apply_rolling(signal, freq, window_sec, step_size, get_crossing)
+
+
+def rolling_band_power_multitaper(signal, freq, freq_range=(0.5, 4), ref_power=1e-13,
+                                  window_sec=2, step_size=1, in_dB=True) -> np.array:
+    import mne
+    from scipy.integrate import simpson
+
+    def get_band_power_multitaper(a, start, end):
+        a = a[start:end]
+        psd, freqs = mne.time_frequency.psd_array_multitaper(a, sfreq=freq,
+                                                             fmin=freq_range[0], fmax=freq_range[1], adaptive=True,
+                                                             normalization='full', verbose=False)
+        freq_res = freqs[1] - freqs[0]
+        delta_idx = (freqs >= freq_range[0]) & (freqs <= freq_range[1])
+        delta_power = psd[delta_idx] / ref_power
+        if in_dB:
+            delta_power = simpson(10 * np.log10(delta_power), dx=freq_res)
+        else:
+            delta_power = np.mean(delta_power)
+        return delta_power
+    return apply_rolling(signal, freq, window_sec, step_size, get_band_power_multitaper)
+
+
+def rolling_band_power_fourier_sum(signal, freq, freq_range=(0.5, 4), ref_power=0.001,
+                                   window_sec=2, step_size=1) -> np.array:
+    def get_band_power_fourier_sum(a, start, end):
+        a = a[start:end]
+        fft_data = np.fft.fft(a)
+        power_spectrum = np.abs(fft_data)**2
+        freq_resolution = freq / len(a)
+        delta_freq_indices = np.where((np.fft.fftfreq(len(a), 1/freq) >= freq_range[0]) &
+                                      (np.fft.fftfreq(len(a), 1/freq) <= freq_range[1]))[0]
+        return np.sum(power_spectrum[delta_freq_indices] / ref_power) * freq_resolution
+    return apply_rolling(signal, freq, window_sec, step_size, get_band_power_fourier_sum)
+
+
+def rolling_band_power_welch(signal, freq, freq_range=(0.5, 4), ref_power=0.001,
+                             window_sec=2, step_size=1) -> np.array:
+    from scipy.integrate import simpson
+    from scipy.signal import welch
+    from scipy.signal.windows import hann
+
+    def get_band_power_welch(a, start, end):
+        window_length = int(window_sec * freq)
+        windowed_data = a[start:end] * hann(window_length)
+        freqs, psd = welch(windowed_data, window='hann', fs=freq,
+                           nperseg=window_length, noverlap=window_length//2)
+        freq_res = freqs[1] - freqs[0]
+        delta_idx = (freqs >= freq_range[0]) & (freqs <= freq_range[1])
+        return simpson(10 * np.log10(psd[delta_idx] / ref_power), dx=freq_res)
+    return apply_rolling(signal, freq, window_sec, step_size, get_band_power_welch)
+
+
+def rolling_hjorth(signal, freq, window_sec=30, step_size=1) -> tuple:
+    """
+    Per-window Hjorth mobility and complexity straight from their definitions
+    """
+    def mobility(a, start, end):
+        x = a[start:end]
+        return np.sqrt(np.diff(x).var() / x.var())
+
+    def complexity(a, start, end):
+        x = a[start:end]
+        dx = np.diff(x)
+        return np.sqrt(np.diff(dx).var() / dx.var()) / np.sqrt(dx.var() / x.var())
+    return (apply_rolling(signal, freq, window_sec, step_size, mobility),
+            apply_rolling(signal, freq, window_sec, step_size, complexity))
+
+
+def heart_rate_from_peaks(n_samples, freq, rpeaks) -> np.array:
+    """
+    Dense per-sample heart rate from R-peak indices, sampled once per second
+    """
+    heart_rates = [60 / ((rpeaks[i+1] - rpeaks[i]) / freq) for i in range(len(rpeaks) - 1)]
+    hr_data = np.zeros(n_samples)
+    for i in range(len(rpeaks) - 1):
+        hr_data[rpeaks[i]:rpeaks[i+1]] = heart_rates[i]
+    return hr_data[::freq]
+
+
+def detect_rpeaks(signal, freq, search_radius=200) -> np.array:
+    import wfdb.processing
+    from sleepecg import detect_heartbeats
+
+    rpeaks = detect_heartbeats(signal, freq)
+    return wfdb.processing.correct_peaks(
+        signal, rpeaks, search_radius=search_radius, smooth_window_size=50, peak_dir="up"
+    )
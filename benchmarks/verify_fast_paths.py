@@ -0,0 +1,301 @@
+"""
+Equivalence harness comparing the Channel feature implementations against
+the frozen reference implementations in benchmarks/reference.py.
+
+Every case runs on synthetic and recorded-style signals at several sampling
+rates and window/step combinations. It checks that the output length and
+edge NaN positions match exactly and that values agree within the case's
+tolerance (exact for counts, rounding error for Hjorth parameters, band
+powers and heart rate, a few percent for band powers computed on decimated
+signals), and reports the speedup of the current implementation next to
+the result. Combinations listed in KNOWN_FAILURES are still run and
+reported, as XFAIL, but do not fail the run.
+
+    python benchmarks/verify_fast_paths.py [--quick] [--edf FILE --channel NAME]
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import reference  # noqa: E402
+from utils.Channel import Channel  # noqa: E402
+
+START_TS = datetime(2020, 1, 1)
+
+
+def make_signals(freq, duration, seed=0) -> dict:
+    """
+    Deterministic test signals (in volts, like mne's output) at `freq` Hz
+    sines: two pure tones in white noise
+    recorded: 1/f background with spindle bursts, a flat-line dropout and clipping
+    ecg: pulse train with varying beat intervals
+    """
+    rng = np.random.default_rng(seed)
+    n = int(duration * freq)
+    t = np.arange(n) / freq
+
+    sines = 40e-6 * np.sin(2*np.pi*1.5*t) + 10e-6 * np.sin(2*np.pi*11*t) \
+        + 5e-6 * rng.standard_normal(n)
+
+    spectrum = np.fft.rfft(rng.standard_normal(n))
+    f = np.fft.rfftfreq(n, 1/freq)
+    spectrum[1:] /= np.sqrt(f[1:])
+    spectrum[0] = 0
+    recorded = np.fft.irfft(spectrum, n)
+    recorded *= 30e-6 / recorded.std()
+    for burst in range(int(duration // 40)):
+        start = int((20 + 40*burst) * freq)
+        burst_t = t[start:start + freq]
+        recorded[start:start + freq] += 15e-6 * np.sin(2*np.pi*13*burst_t) * np.hanning(len(burst_t))
+    dropout = int(duration * 0.3 * freq)
+    recorded[dropout:dropout + 5*freq] = 0
+    recorded = np.clip(recorded, -80e-6, 80e-6)
+
+    ecg = np.zeros(n)
+    beat = 0.0
+    while beat < duration:
+        ecg[int(beat * freq)] = 1.0
+        beat += 0.8 + 0.1 * np.sin(beat / 10) + 0.02 * rng.standard_normal()
+    kernel = np.hanning(max(int(0.03 * freq), 3))
+    ecg = 1e-3 * np.convolve(ecg, kernel / kernel.max(), 'same') + 2e-5 * rng.standard_normal(n)
+
+    return {'sines': sines, 'recorded': recorded, 'ecg': ecg}
+
+
+def make_channel(name, signal, freq) -> Channel:
+    return Channel(START_TS, name, signal, time=np.arange(len(signal)) / freq, freq=freq)
+
+
+def edge_run(values, from_end=False) -> int:
+    """
+    Length of the run of NaN at the start (or end) of `values`
+    """
+    missing = np.isnan(values[::-1] if from_end else values)
+    return len(missing) if missing.all() else int(np.argmin(missing))
+
+
+def compare(ref, fast, median_rtol, p95_rtol, max_rtol, degenerate='match', intended=None) -> tuple:
+    """
+    Returns (ok, detail, errors) where errors are the median relative error
+    and the 95th percentile and maximum errors relative to the largest
+    reference magnitude.
+    Edge NaN runs must match exactly. Interior windows where the reference
+    is not finite (e.g. log of zero power over a flat line) are degenerate:
+    with degenerate='match' the fast result must not be finite either, with
+    'skip' they are left out of the comparison and only counted.
+    intended: boolean vector of the windows where the fast path deliberately
+    differs from the reference (see INTENDED_DIFFERENCES), not compared
+    """
+    errors = (np.nan, np.nan, np.nan)
+    if len(ref) != len(fast):
+        return False, f"length {len(fast)} != {len(ref)}", errors
+    note = ''
+    if intended is not None and intended.any():
+        ref = np.where(intended, fast, ref)
+        note = f"({intended.sum()} intended differences)"
+    for from_end in (False, True):
+        if edge_run(ref, from_end) != edge_run(fast, from_end):
+            return False, 'edge NaN positions differ', errors
+    undefined = ~np.isfinite(ref)
+    interior = undefined.copy()
+    interior[:edge_run(ref)] = False
+    interior[len(ref) - edge_run(ref, from_end=True):] = False
+    detail = ''
+    if interior.any():
+        if degenerate == 'match' and np.isfinite(fast[interior]).any():
+            return False, 'finite values in degenerate windows', errors
+        detail = f"({interior.sum()} degenerate windows)"
+    detail = f"{detail} {note}".strip()
+    compared = ~undefined & np.isfinite(fast)
+    if (~undefined & ~np.isfinite(fast)).any():
+        return False, 'non-finite values where the reference is finite', errors
+    if not compared.any():
+        return True, detail, (0.0, 0.0, 0.0)
+    diff = np.abs(ref[compared] - fast[compared])
+    scale = np.abs(ref[compared])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = np.where(diff == 0, 0.0, diff / scale)
+    diff = diff / scale.max() if scale.max() else diff
+    errors = (float(np.median(relative)), float(np.percentile(diff, 95)), float(diff.max()))
+    ok = errors[0] <= median_rtol and errors[1] <= p95_rtol and errors[2] <= max_rtol
+    return ok, detail if ok else f"tolerance exceeded {detail}".strip(), errors
+
+
+def wrapped_peak_windows(signal, freq, window_sec, step_size) -> np.array:
+    """
+    Output seconds the dense heart rate original wrote through R-peak
+    indices outside of the signal: peak correction can return indices
+    before the first sample, which its slices wrapped around to the end of
+    the recording. Channel.get_heart_beats drops those peaks instead.
+    """
+    rpeaks = reference.detect_rpeaks(signal, freq)
+    wrapped = np.zeros(len(signal), dtype=bool)
+    for i in range(len(rpeaks) - 1):
+        if min(rpeaks[i], rpeaks[i+1]) < 0 or max(rpeaks[i], rpeaks[i+1]) >= len(signal):
+            wrapped[rpeaks[i]:rpeaks[i+1]] = True
+    return wrapped[::freq]
+
+
+# case name -> function(signal, freq, window_sec, step_size) of the windows
+# where the current implementation intentionally departs from the reference
+INTENDED_DIFFERENCES = {
+    'heart_rate': wrapped_peak_windows,
+}
+
+
+def timed(fn) -> tuple:
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+EXACT = {'median_rtol': 0.0, 'p95_rtol': 0.0, 'max_rtol': 0.0}
+FLOAT = {'median_rtol': 1e-9, 'p95_rtol': 1e-9, 'max_rtol': 1e-9}
+# band powers on decimated signals (decimate=True) are a different
+# (lower-rate) estimate of the same spectrum, see Channel.band_limit.
+# Integrating the dB of a handful of frequency bins is noisy, so single
+# windows can move by more than the bulk: the maximum gets a looser bound
+# than the median and 95th percentile, looser still for Welch whose windows
+# are tapered twice. Windows over a flat line have no power at all, -inf at
+# full rate but only very low after the decimation filter, and are skipped.
+DECIMATED = {'median_rtol': 0.02, 'p95_rtol': 0.05, 'max_rtol': 0.1, 'degenerate': 'skip'}
+DECIMATED_WELCH = {**DECIMATED, 'max_rtol': 0.15}
+
+# (case, signal) combinations known to leave their tolerance, with the reason
+KNOWN_FAILURES = {
+    # mne's adaptive multitaper weights depend on the total power of the
+    # window, which decimation removes outside the band: on tones the
+    # estimate drifts by several percent, hence decimate=False by default
+    ('band_power_multitaper_decimated', 'sines'): 'adaptive weights shift on tonal signals',
+}
+
+
+def get_cases(quick) -> list:
+    """
+    Each case: (name, signals it applies to, reference(signal, freq, w, s),
+    fast(channel, w, s), tolerance, window/step combinations)
+    """
+    windows = [(2, 1), (4, 2)] if quick else [(2, 1), (4, 2), (30, 1), (2, 0.5)]
+    short_windows = [(2, 1)] if quick else [(2, 1), (4, 2)]
+    return [
+        ('zero_crossings', ('sines', 'recorded'),
+         lambda x, f, w, s: reference.rolling_zero_crossings(x, f, w, s),
+         lambda c, w, s: c.get_rolling_zero_crossings(w, s).signal,
+         EXACT, windows),
+        ('hjorth_mobility', ('sines', 'recorded'),
+         lambda x, f, w, s: reference.rolling_hjorth(x, f, w, s)[0],
+         lambda c, w, s: c.get_rolling_hjorth_mobility(w, s).signal,
+         FLOAT, windows),
+        ('hjorth_complexity', ('sines', 'recorded'),
+         lambda x, f, w, s: reference.rolling_hjorth(x, f, w, s)[1],
+         lambda c, w, s: c.get_rolling_hjorth_complexity(w, s).signal,
+         FLOAT, windows),
+        ('band_power_welch', ('sines', 'recorded'),
+         lambda x, f, w, s: reference.rolling_band_power_welch(x, f, (0.5, 4), 1e-13, w, s),
+         lambda c, w, s: c.get_rolling_band_power_welch((0.5, 4), 1e-13, w, s).signal,
+         FLOAT, windows),
+        ('band_power_welch_decimated', ('sines', 'recorded'),
+         lambda x, f, w, s: reference.rolling_band_power_welch(x, f, (0.5, 4), 1e-13, w, s),
+         lambda c, w, s: c.get_rolling_band_power_welch((0.5, 4), 1e-13, w, s, decimate=True).signal,
+         DECIMATED_WELCH, windows),
+        ('band_power_fourier_sum', ('sines', 'recorded'),
+         lambda x, f, w, s: reference.rolling_band_power_fourier_sum(x, f, (0.5, 4), 1e-13, w, s),
+         lambda c, w, s: c.get_rolling_band_power_fourier_sum((0.5, 4), 1e-13, w, s).signal,
+         FLOAT, windows),
+        ('band_power_fourier_sum_decimated', ('sines', 'recorded'),
+         lambda x, f, w, s: reference.rolling_band_power_fourier_sum(x, f, (0.5, 4), 1e-13, w, s),
+         lambda c, w, s: c.get_rolling_band_power_fourier_sum((0.5, 4), 1e-13, w, s, decimate=True).signal,
+         DECIMATED, windows),
+        ('band_power_multitaper', ('sines', 'recorded'),
+         lambda x, f, w, s: reference.rolling_band_power_multitaper(x, f, (0.5, 4), 1e-13, w, s),
+         lambda c, w, s: c.get_rolling_band_power_multitaper((0.5, 4), 1e-13, w, s).signal,
+         FLOAT, short_windows),
+        ('band_power_multitaper_decimated', ('sines', 'recorded'),
+         lambda x, f, w, s: reference.rolling_band_power_multitaper(x, f, (0.5, 4), 1e-13, w, s),
+         lambda c, w, s: c.get_rolling_band_power_multitaper((0.5, 4), 1e-13, w, s, decimate=True).signal,
+         DECIMATED, short_windows),
+        ('heart_rate', ('ecg',),
+         lambda x, f, w, s: reference.heart_rate_from_peaks(len(x), f, reference.detect_rpeaks(x, f)),
+         lambda c, w, s: c.get_heart_rate().signal,
+         FLOAT, [(None, 1)]),
+    ]
+
+
+def warm_up() -> None:
+    # the features import their heavy dependencies lazily, load them once
+    # up front so that the first timed case does not pay for the import
+    import mne  # noqa: F401
+    import scipy.integrate  # noqa: F401
+    import scipy.signal  # noqa: F401
+    import sleepecg  # noqa: F401
+    import wfdb.processing  # noqa: F401
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='fewer rates and window/step combinations')
+    parser.add_argument('--duration', type=float, default=None, help='synthetic signal length in seconds')
+    parser.add_argument('--rates', type=int, nargs='*', default=None, help='sampling rates to test')
+    parser.add_argument('--edf', help='also run on a channel of this EDF file')
+    parser.add_argument('--channel', help='channel of --edf to use')
+    parser.add_argument('--case', action='append', help='only run cases with this name (repeatable)')
+    args = parser.parse_args(argv)
+    os.environ.setdefault('MNE_LOGGING_LEVEL', 'WARNING')
+
+    warm_up()
+    rates = args.rates or ([100, 500] if args.quick else [100, 250, 500])
+    duration = args.duration or (120 if args.quick else 300)
+
+    datasets = []
+    for freq in rates:
+        for name, signal in make_signals(freq, duration).items():
+            datasets.append((name, freq, signal))
+    if args.edf:
+        from utils.EDF import EDFutils
+        channel = EDFutils(args.edf)[args.channel]
+        datasets.append(('edf', channel.freq, channel.signal))
+
+    print(f"{'case':32} {'signal':9} {'Hz':>5} {'win/step':>9} {'median err':>11} "
+          f"{'p95 err':>9} {'max err':>9} {'ref s':>8} {'fast s':>8} {'speedup':>8}  result")
+    failures = 0
+    known_failures = 0
+    for name, kinds, ref_fn, fast_fn, tolerance, combos in get_cases(args.quick):
+        if args.case and name not in args.case:
+            continue
+        for kind, freq, signal in datasets:
+            if kind not in kinds and not (kind == 'edf' and 'ecg' not in kinds):
+                continue
+            channel = make_channel(kind, signal, freq)
+            for window_sec, step_size in combos:
+                ref, ref_time = timed(lambda: ref_fn(signal, freq, window_sec, step_size))
+                fast, fast_time = timed(lambda: np.asarray(fast_fn(channel, window_sec, step_size), dtype=np.float64))
+                intended = INTENDED_DIFFERENCES.get(name)
+                if intended is not None:
+                    intended = intended(signal, freq, window_sec, step_size)
+                ok, detail, (median_err, p95_err, max_err) = compare(ref, fast, intended=intended, **tolerance)
+                known = KNOWN_FAILURES.get((name, kind))
+                if known:
+                    known_failures += not ok
+                    result = 'XFAIL' if not ok else 'XPASS'
+                    detail = f"{detail} (known: {known})".strip()
+                else:
+                    failures += not ok
+                    result = 'PASS' if ok else 'FAIL'
+                combo = '-' if window_sec is None else f"{window_sec}/{step_size}"
+                print(f"{name:32} {kind:9} {freq:5} {combo:>9} {median_err:11.2e} {p95_err:9.2e} {max_err:9.2e} "
+                      f"{ref_time:8.3f} {fast_time:8.3f} {ref_time / max(fast_time, 1e-9):7.1f}x  "
+                      f"{result} {detail}", flush=True)
+
+    print(f"\n{failures} failure(s), {known_failures} known failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
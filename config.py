@@ -1,4 +1,22 @@
 APP_NAME = 'Marine Somniac'
 PROJECT_NAME = ''
 
-ANALYSIS_STORE = 'filestore'
\ No newline at end of file
+ANALYSIS_STORE = 'filestore'
+
+# Features computed by the headless batch runner (`batch.py`) when an
+# analysis' EDFconfig.json does not supply its own `features` list.
+# `group` refers to the channel groups written by ConfigureEDF.get_configuration
+DEFAULT_FEATURES = [
+    {'name': 'delta_power', 'group': 'EEG', 'method': 'get_rolling_band_power_welch',
+     'kwargs': {'freq_range': [0.5, 4], 'window_sec': 30, 'step_size': 1}},
+    {'name': 'zero_crossings', 'group': 'EEG', 'method': 'get_rolling_zero_crossings',
+     'kwargs': {'window_sec': 10, 'step_size': 1}},
+    {'name': 'heart_rate', 'group': 'ECG', 'method': 'get_heart_rate',
+     'kwargs': {}},
+]
+FEATURE_DIR = 'features'
+# partial rolling feature results of interrupted runs, see utils.Checkpoint
+CHECKPOINT_DIR = 'checkpoints'
+
+# column of a label CSV holding the scored state of each row
+LABEL_COLUMN = 'label'
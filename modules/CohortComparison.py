@@ -0,0 +1,63 @@
+import streamlit as st
+from utils.SessionBase import SessionBase
+from modules.FeatureJobs import get_job_manager
+from utils.Cohort import update_cohort
+
+
+class CohortComparison(SessionBase):
+    def __init__(self) -> None:
+        self.manager = get_job_manager()
+        self.analyses = []
+        self.compute_missing = False
+        self.workers = None
+
+    def pick_analyses(self) -> None:
+        self.analyses = st.multiselect(
+            'Analyses to compare',
+            options=self.get_existing_analyses()
+        )
+        c = st.columns(2)
+        self.compute_missing = c[0].checkbox(
+            'Compute missing features first',
+            help='Runs the configured features (see DEFAULT_FEATURES in config.py) '
+                 'for analyses that have not computed them yet'
+        )
+        self.workers = c[1].number_input('Worker processes', value=4, min_value=1) or None
+
+    def submit(self) -> None:
+        if st.button('Update cohort table', disabled=len(self.analyses) == 0):
+            key = ('cohort', tuple(self.analyses), self.compute_missing)
+            # a finished job would be returned as is, drop it so the table is refreshed
+            self.manager.forget(key)
+            st.session_state['jobs'][key] = self.manager.submit(
+                key,
+                update_cohort,
+                list(self.analyses),
+                workers=self.workers,
+                compute_missing=self.compute_missing,
+                description=f"Cohort of {len(self.analyses)} analyses"
+            )
+            st.session_state['cohort_job'] = key
+
+    @st.fragment(run_every=2)
+    def show_table(self) -> None:
+        key = st.session_state.get('cohort_job')
+        job = st.session_state['jobs'].get(key) if key else None
+        if job is None:
+            st.info("Pick analyses and update the cohort table.")
+            return
+        if job.active:
+            st.progress(job.progress, text=job.message or 'Summarizing analyses...')
+            if st.button('Cancel'):
+                job.cancel()
+        elif job.status == 'failed':
+            st.error(str(job.error))
+        elif job.status == 'done':
+            table = job.result
+            st.dataframe(table, use_container_width=True)
+            st.download_button(
+                'Download cohort table',
+                data=table.to_csv(),
+                file_name='cohort.csv',
+                mime='text/csv'
+            )
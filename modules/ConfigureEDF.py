@@ -1,44 +1,53 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta
 import modules.instructions as instruct
 from utils.SessionBase import SessionBase
-from utils.EDF import EDFutils
+from utils.EDFIndex import EDFIndex
 
 
-@st.cache_data(show_spinner=False)
-def load_edf_details(path):
-    edf = EDFutils(path)
-    details = {}
-    details['start_ts'] = edf.start_ts
-    details['end_ts'] = edf.end_ts
-    details['freqs'] = edf.channel_freqs
-    details['channels'] = edf.channels
-    return details
+def load_edf_details(paths):
+    # the sidecar index is cheap to read and survives server restarts,
+    # unlike st.cache_data
+    if len(paths) == 1:
+        return EDFIndex.load(paths[0]).get_details()
+    from utils.EDF import EDFSet
+    return EDFSet(paths).get_details()
 
 
 class ConfigureEDF(SessionBase):
     def __init__(self, analysis) -> None:
         self.analysis = analysis
         self.edfpath = self.get_edf_from_analysis(analysis, path=True)
+        self.edfpaths = self.get_edfs_from_analysis(analysis, path=True)
         self.channel_map = None
         self.time_range = None
 
     def upload_file(self) -> None:
         file = st.file_uploader('Drop your EDF file here')
+        existing_edfs = self.get_edfs_from_analysis(self.analysis)
+        append = st.checkbox(
+            'Add as another segment of the same recording',
+            disabled=not existing_edfs,
+            help=instruct.APPEND_SEGMENT_HELP
+        )
+        cache = st.checkbox('Keep a compressed copy for faster reads', help=instruct.RAW_CACHE_HELP)
         if st.button('Save EDF to analysis', disabled=file is None):
             with st.spinner('Writing file to disk, this may take a minute...'):
-                self.write_edf(file, self.analysis)
+                self.write_edf(file, self.analysis, append=append, cache=cache)
 
-        existing_edf = self.get_edf_from_analysis(self.analysis)
-        if existing_edf:
+        existing_edfs = self.get_edfs_from_analysis(self.analysis)
+        if len(existing_edfs) > 1:
+            st.info(f"This analysis holds {len(existing_edfs)} EDF segments: "
+                    + ", ".join(f"`{edf}`" for edf in existing_edfs))
+        if existing_edfs and not append:
             st.warning("An EDF file already exists in this analysis. "
                        "Clicking the save button will overwrite it")
         self.edfpath = self.get_edf_from_analysis(self.analysis, path=True)
+        self.edfpaths = self.get_edfs_from_analysis(self.analysis, path=True)
 
     def initialize_edf_properties(self) -> None:
         with st.spinner(f'Reading metadata from EDF, please wait...'):
-            self.edf = load_edf_details(self.edfpath)
+            self.edf = load_edf_details(self.edfpaths)
 
     def set_time_range(self) -> None:
         with st.expander("Set time range", True):
@@ -80,6 +89,7 @@ class ConfigureEDF(SessionBase):
         self.time_range = (user_start, user_end)
         
     def channel_mapping(self) -> None:
+        import pandas as pd
         picked_channels = st.multiselect(
             'What channels will you be using?',
             options=self.edf['channels']
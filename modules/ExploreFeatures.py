@@ -0,0 +1,85 @@
+import streamlit as st
+import numpy as np
+from utils.SessionBase import SessionBase
+from utils.AnalysisStore import AnalysisStore
+from utils.Spectrogram import Spectrogram
+from utils.QualityControl import QualityMask
+
+
+class SpectrogramExplorer(SessionBase):
+    def __init__(self, analysis) -> None:
+        self.analysis = analysis
+        self.analysis_dir = AnalysisStore.get_analysis_dir(analysis)
+        self.config = AnalysisStore.read_configuration(analysis, 'EDFconfig.json')
+        self.eeg_channels = self.config['channels']['map']['EEG'] if self.config else []
+        self.edf_paths = self.get_edfs_from_analysis(analysis, path=True)
+        # spectrograms of EDF files that have since been replaced count as not computed
+        self.sources = QualityMask.get_sources(self.edf_paths)
+
+    def get_spectrogram_directory(self, channel) -> str:
+        return Spectrogram.get_directory(self.analysis_dir, channel)
+
+    def compute_spectrograms(self) -> None:
+        if not self.eeg_channels:
+            st.error("No EEG channels configured for this analysis. "
+                     'Map them in the "Create or Edit Analysis" page.')
+            return
+        missing = [ch for ch in self.eeg_channels
+                   if not Spectrogram.exists(self.get_spectrogram_directory(ch), self.sources)]
+        channels = st.multiselect('EEG channels', options=self.eeg_channels, default=missing)
+        c = st.columns(3)
+        window_sec = c[0].number_input('Window (seconds)', value=4, min_value=1)
+        step_size = c[1].number_input('Step (seconds)', value=1, min_value=1)
+        fmax = c[2].number_input('Highest frequency (Hz)', value=50, min_value=1)
+        if st.button('Compute spectrograms', disabled=not channels):
+            from utils.EDF import open_edf
+            edf = open_edf(self.edf_paths)
+            for channel in channels:
+                with st.spinner(f'Computing spectrogram of {channel}...'):
+                    Spectrogram.compute(
+                        edf[channel],
+                        self.get_spectrogram_directory(channel),
+                        window_sec=window_sec,
+                        step_size=step_size,
+                        segment_sec=min(2, window_sec),
+                        fmax=fmax,
+                        sources=self.sources
+                    )
+
+    def show_spectrogram(self) -> None:
+        available = [ch for ch in self.eeg_channels
+                     if Spectrogram.exists(self.get_spectrogram_directory(ch), self.sources)]
+        if not available:
+            st.info("No spectrograms computed yet for this analysis.")
+            return
+        channel = st.selectbox('Channel', options=available)
+        spectrogram = Spectrogram(self.get_spectrogram_directory(channel))
+        duration = spectrogram.meta['n_frames'][0] * spectrogram.meta['step_size']
+
+        c = st.columns([4, 1])
+        start_sec, end_sec = c[0].slider(
+            'Time range (seconds from recording start)',
+            min_value=0.0,
+            max_value=float(duration),
+            value=(0.0, float(duration))
+        )
+        fmax = c[1].number_input('Max Hz', value=float(spectrogram.freqs[-1]),
+                                 min_value=1.0, max_value=float(spectrogram.freqs[-1]))
+        level = spectrogram.choose_level(start_sec, end_sec)
+        time, freqs, psd = spectrogram.read(start_sec, end_sec, level)
+        if not len(time):
+            st.warning("No frames in the selected range.")
+            return
+        st.caption(f"Zoom level {level} ({spectrogram.get_level_step(level)} s per frame)")
+
+        import matplotlib.pyplot as plt
+        keep = freqs <= fmax
+        fig, ax = plt.subplots(figsize=(12, 4))
+        with np.errstate(divide='ignore'):
+            mesh = ax.pcolormesh(time, freqs[keep], 10 * np.log10(psd[:, keep].T),
+                                 shading='nearest', cmap='viridis')
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel('Frequency (Hz)')
+        fig.colorbar(mesh, ax=ax, label='Power (dB)')
+        st.pyplot(fig)
+        plt.close(fig)
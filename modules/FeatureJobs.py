@@ -0,0 +1,177 @@
+import os
+import json
+import streamlit as st
+from utils.SessionBase import SessionBase
+from utils.AnalysisStore import AnalysisStore
+from utils.Jobs import JobManager
+from utils.QualityControl import QualityMask
+
+
+FEATURE_METHODS = {
+    'Band power (Welch)': 'get_rolling_band_power_welch',
+    'Band power (multitaper)': 'get_rolling_band_power_multitaper',
+    'Band power (Fourier sum)': 'get_rolling_band_power_fourier_sum',
+    'Zero crossings': 'get_rolling_zero_crossings',
+    'Threshold crossings': 'get_rolling_threshold_crossings',
+    'Peak count': 'get_rolling_peak_count',
+    'Hjorth mobility': 'get_rolling_hjorth_mobility',
+    'Hjorth complexity': 'get_rolling_hjorth_complexity',
+    'Rolling mean': 'get_rolling_mean',
+    'Rolling standard deviation': 'get_rolling_std',
+    'Heart rate': 'get_heart_rate',
+    'Heart rate variability': 'get_rolling_hrv',
+}
+BAND_METHODS = (
+    'get_rolling_band_power_welch',
+    'get_rolling_band_power_multitaper',
+    'get_rolling_band_power_fourier_sum',
+)
+
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    # one manager per server process, shared by all sessions so that
+    # identical jobs submitted from different tabs are only run once
+    return JobManager()
+
+
+def compute_feature(analysis, channel, feature) -> str:
+    from utils.FeatureRunner import FeatureRunner
+    return FeatureRunner(analysis).run_feature(channel, feature)
+
+
+def scan_quality(analysis) -> str:
+    edf_paths = AnalysisStore.get_edfs_from_analysis(analysis, path=True)
+    return QualityMask.scan(edf_paths).write(AnalysisStore.get_analysis_dir(analysis))
+
+
+class FeatureJobs(SessionBase):
+    def __init__(self, analysis) -> None:
+        self.analysis = analysis
+        self.manager = get_job_manager()
+        self.config = AnalysisStore.read_configuration(analysis, 'EDFconfig.json')
+
+    def get_channels(self) -> list:
+        if self.config is None:
+            return []
+        channel_map = self.config['channels']['map']
+        return [ch for group, channels in channel_map.items()
+                if group != 'ignore' for ch in channels]
+
+    def feature_form(self) -> None:
+        channels = self.get_channels()
+        if not channels:
+            st.error("No channels configured for this analysis. "
+                     'Map them in the "Create or Edit Analysis" page.')
+            return
+
+        c = st.columns(2)
+        channel = c[0].selectbox('Channel', options=channels)
+        method_label = c[1].selectbox('Feature', options=list(FEATURE_METHODS))
+        method = FEATURE_METHODS[method_label]
+
+        kwargs = {}
+        if method != 'get_heart_rate':
+            c = st.columns(4)
+            # HRV metrics, LF/HF especially, need minutes of beats per window
+            default_window = 300 if method == 'get_rolling_hrv' else 30
+            kwargs['window_sec'] = c[0].number_input('Window (seconds)', value=default_window, min_value=1)
+            kwargs['step_size'] = c[1].number_input('Step (seconds)', value=1, min_value=1)
+            if method in BAND_METHODS:
+                low = c[2].number_input('Lower frequency (Hz)', value=0.5, min_value=0.0)
+                high = c[3].number_input('Upper frequency (Hz)', value=4.0, min_value=0.1)
+                kwargs['freq_range'] = [low, high]
+                kwargs['decimate'] = st.checkbox(
+                    'Decimate to the band', value=False,
+                    help='Faster, computes on a copy downsampled to the band of interest. '
+                         'Most windows are within 1-2% of the full-rate estimate, but single '
+                         'short windows can differ by up to ~15% (Welch), and multitaper drifts '
+                         'further on signals with strong tones or line noise.')
+            elif method == 'get_rolling_threshold_crossings':
+                kwargs['threshold'] = c[2].number_input('Threshold', value=0.0, format="%.3e")
+                kwargs['direction'] = c[3].selectbox('Direction', options=['both', 'up', 'down'])
+            elif method == 'get_rolling_hrv':
+                kwargs['metric'] = c[2].selectbox('Metric', options=['rmssd', 'sdnn', 'lf_hf'])
+        default_name = method.replace('get_rolling_', '').replace('get_', '')
+        # one output per band or metric, see FeatureRunner.get_output_path
+        if 'freq_range' in kwargs:
+            default_name = f"{default_name}_{kwargs['freq_range'][0]:g}-{kwargs['freq_range'][1]:g}"
+        if 'metric' in kwargs:
+            default_name = f"{default_name}_{kwargs['metric']}"
+        name = st.text_input('Feature name', value=default_name)
+
+        if st.button('Compute in background'):
+            self.submit(channel, {'name': name, 'method': method, 'kwargs': kwargs})
+
+    def submit(self, channel, feature: dict) -> None:
+        # the EDF identity is part of the key so that replacing an EDF starts
+        # a new computation instead of returning the job of the old one
+        edf_paths = AnalysisStore.get_edfs_from_analysis(self.analysis, path=True)
+        sources = json.dumps(QualityMask.get_sources(edf_paths), sort_keys=True)
+        spec = json.dumps(feature, sort_keys=True)
+        for other, job in st.session_state['jobs'].items():
+            if len(other) != 4 or other[:2] != (self.analysis, channel) or other[3] != sources:
+                continue
+            if other[2] != spec and json.loads(other[2])['name'] == feature['name'] \
+                    and job.status not in ('failed', 'cancelled'):
+                # both would write the same output and checkpoint
+                st.error(f"{channel}.{feature['name']} is already computed with different "
+                         "settings, choose another feature name.")
+                return
+        key = (self.analysis, channel, spec, sources)
+        job = self.manager.get(key)
+        if job is not None and job.status == 'done' and not os.path.isfile(job.result):
+            # the output was deleted since, compute it again
+            self.manager.forget(key)
+        job = self.manager.submit(
+            key,
+            compute_feature,
+            self.analysis,
+            channel,
+            feature,
+            description=f"{self.analysis}: {channel}.{feature['name']}"
+        )
+        st.session_state['jobs'][key] = job
+
+    def quality_control(self) -> None:
+        edf_paths = AnalysisStore.get_edfs_from_analysis(self.analysis, path=True)
+        mask = QualityMask.load(AnalysisStore.get_analysis_dir(self.analysis), edf_paths) if edf_paths else None
+        if mask is None:
+            st.info("This analysis has not been scanned yet. The scan flags flat-lines, clipping, "
+                    "variance spikes and dropouts. Features skip the windows overlapping flat-lines, "
+                    "clipping and dropouts; spikes are only reported.")
+        else:
+            st.markdown(f"Fraction of {mask.epoch_sec}s epochs flagged per channel. "
+                        "Features are not computed over windows overlapping flat, clipped or "
+                        "dropout epochs; spikes are only reported.")
+            summary = mask.get_summary()
+            st.dataframe([{'channel': ch, **fractions} for ch, fractions in summary.items()],
+                         hide_index=True)
+        if st.button('Scan recording' if mask is None else 'Rescan recording', disabled=not edf_paths):
+            key = ('quality', self.analysis)
+            self.manager.forget(key)
+            st.session_state['jobs'][key] = self.manager.submit(
+                key, scan_quality, self.analysis,
+                description=f"{self.analysis}: quality control scan"
+            )
+
+    @st.fragment(run_every=2)
+    def job_status(self) -> None:
+        jobs = st.session_state['jobs']
+        if not jobs:
+            st.info("No feature jobs started in this session.")
+            return
+        for key, job in list(jobs.items()):
+            c = st.columns([6, 2, 1])
+            c[0].progress(job.progress, text=f"{job.description} ({job.status}, {job.elapsed:.0f}s)")
+            if job.status == 'failed':
+                c[1].error(str(job.error))
+            elif job.status == 'done':
+                c[1].success(f"Saved to `{job.result}`")
+            if job.active:
+                if c[2].button('Cancel', key=f"cancel-{hash(key)}"):
+                    job.cancel()
+            elif c[2].button('Clear', key=f"clear-{hash(key)}"):
+                del jobs[key]
+                self.manager.forget(key)
+                st.rerun(scope='fragment')
@@ -4,6 +4,10 @@ PICK_ANALYSIS_HELP = 'You can create an analysis in the "Start New Analysis" pag
 ANALYSIS_NAME = 'This will be a directory name, special characters may be rejected'
 UPLOAD_HELP = "Drop only one of each file type here (only 1 .edf, 1 .edfconfig, 1 .labelconfig)"
 CHANNEL_TYPE_HELP = ""
+APPEND_SEGMENT_HELP = ("For deployments logged as several consecutive EDF files. "
+                       "All segments of an analysis are read as one continuous recording.")
+RAW_CACHE_HELP = ("Stores the samples again, compressed in chunks, next to the EDF. Features and "
+                  "plots then read only the part of the recording they need. Saving takes a little longer.")
 
 def feature_generation():
     st.markdown('')
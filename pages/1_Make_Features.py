@@ -1,6 +1,7 @@
 import streamlit as st
 import modules.instructions as instruct
 from modules.ConfigureSession import SessionConfig
+from modules.FeatureJobs import FeatureJobs
 from config import *
 
 st.set_page_config(
@@ -8,11 +9,20 @@ st.set_page_config(
     initial_sidebar_state='expanded',
     layout='wide'
 )
-SessionConfig()
+session = SessionConfig()
 SessionConfig.insert_logo()
 
 
 st.title('Compute Features')
 instruct.feature_generation()
 
-
+if not session.chosen_analysis:
+    st.error('Select an analysis in the sidebar to compute its features.')
+else:
+    jobs = FeatureJobs(session.chosen_analysis)
+    with st.expander("Quality control"):
+        jobs.quality_control()
+    with st.expander("New feature", True):
+        jobs.feature_form()
+    st.subheader("Jobs")
+    jobs.job_status()
\ No newline at end of file
@@ -1,5 +1,6 @@
 import streamlit as st
 from modules.ConfigureSession import SessionConfig
+from modules.ExploreFeatures import SpectrogramExplorer
 from config import *
 
 st.set_page_config(
@@ -7,5 +8,14 @@ st.set_page_config(
     initial_sidebar_state='expanded',
     layout='wide'
 )
-SessionConfig()
-SessionConfig.insert_logo()
\ No newline at end of file
+session = SessionConfig()
+SessionConfig.insert_logo()
+
+st.title('Feature Explorer')
+if not session.chosen_analysis:
+    st.error('Select an analysis in the sidebar to explore its features.')
+else:
+    explorer = SpectrogramExplorer(session.chosen_analysis)
+    with st.expander("Compute spectrograms", False):
+        explorer.compute_spectrograms()
+    explorer.show_spectrogram()
\ No newline at end of file
@@ -0,0 +1,18 @@
+import streamlit as st
+from modules.ConfigureSession import SessionConfig
+from modules.CohortComparison import CohortComparison
+from config import *
+
+st.set_page_config(
+    page_title=APP_NAME,
+    initial_sidebar_state='expanded',
+    layout='wide'
+)
+SessionConfig()
+SessionConfig.insert_logo()
+
+st.title('Cohort Comparison')
+cohort = CohortComparison()
+cohort.pick_analyses()
+cohort.submit()
+cohort.show_table()
\ No newline at end of file
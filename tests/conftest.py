@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the tests import the app's packages (utils, config) from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MNE_LOGGING_LEVEL', 'WARNING')
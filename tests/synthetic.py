@@ -0,0 +1,53 @@
+"""
+Synthetic recordings shared by the tests: a minimal EDF writer and an EEG
+(2 Hz sine) plus ECG (75 bpm) pair of signals.
+"""
+import numpy as np
+from datetime import datetime
+
+START_TS = datetime(2020, 1, 1, 12, 0, 0)
+FREQS = {'EEG1': 200, 'ECG': 500}
+
+
+def write_edf(path, start_ts, signals: dict, n_records, record_sec=1) -> None:
+    """
+    Minimal EDF writer: signals maps labels to (freq, samples in uV)
+    """
+    def field(value, width):
+        return str(value).ljust(width)[:width].encode('ascii')
+
+    labels = list(signals)
+    physical_min, physical_max = -3200.0, 3200.0
+    header = field(0, 8) + field('X', 80) + field('Startdate X', 80)
+    header += field(start_ts.strftime('%d.%m.%y'), 8) + field(start_ts.strftime('%H.%M.%S'), 8)
+    header += field(256 * (len(labels) + 1), 8) + field('', 44) + field(n_records, 8)
+    header += field(record_sec, 8) + field(len(labels), 4)
+    for width, values in ((16, labels), (80, [''] * len(labels)), (8, ['uV'] * len(labels)),
+                          (8, [physical_min] * len(labels)), (8, [physical_max] * len(labels)),
+                          (8, [-32768] * len(labels)), (8, [32767] * len(labels)),
+                          (80, [''] * len(labels)), (8, [signals[l][0] * record_sec for l in labels]),
+                          (32, [''] * len(labels))):
+        header += b''.join(field(v, width) for v in values)
+
+    gain = (physical_max - physical_min) / 65535
+    digital = {l: np.clip(np.round((x - physical_min) / gain - 32768), -32768, 32767).astype('<i2')
+               for l, (_, x) in signals.items()}
+    records = []
+    for r in range(n_records):
+        for l in labels:
+            n = signals[l][0] * record_sec
+            records.append(digital[l][r * n:(r + 1) * n].tobytes())
+    with open(path, 'wb') as f:
+        f.write(header + b''.join(records))
+
+
+def make_signals(duration, offset=0.0) -> dict:
+    rng = np.random.default_rng(0)
+    signals = {}
+    t = offset + np.arange(int(duration * FREQS['EEG1'])) / FREQS['EEG1']
+    signals['EEG1'] = (FREQS['EEG1'], 100 * np.sin(2 * np.pi * 2 * t) + 20 * rng.standard_normal(len(t)))
+    ecg = np.zeros(int(duration * FREQS['ECG']))
+    ecg[::400] = 1000
+    ecg = np.convolve(ecg, np.hanning(15), 'same') + 5 * rng.standard_normal(len(ecg))
+    signals['ECG'] = (FREQS['ECG'], ecg)
+    return signals
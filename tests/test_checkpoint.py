@@ -0,0 +1,71 @@
+"""
+Resuming an interrupted rolling computation from its checkpoint.
+"""
+import numpy as np
+import pytest
+
+from synthetic import START_TS, make_signals
+from utils.Channel import Channel
+from utils.Checkpoint import Checkpoint
+
+IDENTITY = {'sources': [], 'channel': 'EEG1', 'method': 'std', 'kwargs': {'window_sec': 10}}
+
+
+def make_channel(duration=120) -> Channel:
+    freq, signal = make_signals(duration)['EEG1']
+    return Channel(start_ts=START_TS, name='EEG1', signal=signal,
+                   time=np.arange(len(signal)) / freq, freq=freq)
+
+
+def window_std(a, start, end) -> float:
+    return a[start:end].std()
+
+
+def test_resume_from_checkpoint(tmp_path):
+    channel = make_channel()
+    expected = channel._apply_rolling(10, 1, window_std)
+    path = f"{tmp_path}/EEG1.std.npz"
+
+    calls = []
+
+    def interrupted(a, start, end):
+        if len(calls) == 50:
+            raise KeyboardInterrupt
+        calls.append(start)
+        return window_std(a, start, end)
+
+    with pytest.raises(KeyboardInterrupt):
+        channel._apply_rolling(10, 1, interrupted, Checkpoint(path, IDENTITY))
+
+    checkpoint = Checkpoint(path, IDENTITY)
+    checkpoint.bind(channel, 10, 1)
+    values, done = checkpoint.load()
+    assert done == 50
+
+    resumed = []
+
+    def counted(a, start, end):
+        resumed.append(start)
+        return window_std(a, start, end)
+
+    result = channel._apply_rolling(10, 1, counted, Checkpoint(path, IDENTITY))
+    np.testing.assert_array_equal(result, expected)
+    # only the windows after the checkpoint are computed again
+    assert len(resumed) == np.isfinite(expected).sum() - 50
+    assert not set(resumed) & set(calls)
+
+
+def test_checkpoint_not_resumed_for_other_inputs(tmp_path):
+    channel = make_channel()
+    path = f"{tmp_path}/EEG1.std.npz"
+    channel._apply_rolling(10, 1, window_std, Checkpoint(path, IDENTITY))
+
+    for identity, other, window_sec in (({**IDENTITY, 'kwargs': {'window_sec': 20}}, channel, 10),
+                                        (IDENTITY, make_channel(duration=100), 10),
+                                        (IDENTITY, channel, 20)):
+        checkpoint = Checkpoint(path, identity)
+        checkpoint.bind(other, window_sec, 1)
+        assert checkpoint.load() is None
+    checkpoint = Checkpoint(path, IDENTITY)
+    checkpoint.bind(channel, 10, 1)
+    assert checkpoint.load() is not None
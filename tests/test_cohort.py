@@ -0,0 +1,48 @@
+"""
+Incremental cohort table: only analyses whose inputs changed are summarized again.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+import config as cfg
+from utils.AnalysisStore import AnalysisStore
+from utils.Cohort import update_cohort, get_summary_dir
+
+
+def write_feature(store, analysis, values) -> str:
+    feature_dir = f"{store}/{analysis}/{cfg.FEATURE_DIR}"
+    os.makedirs(feature_dir, exist_ok=True)
+    path = f"{feature_dir}/EEG1.delta_power.csv"
+    pd.DataFrame({'time': np.arange(len(values)), 'EEG1.get_rolling_band_power_welch': values}).to_csv(path, index=False)
+    AnalysisStore.refresh_analysis(analysis, store)
+    return path
+
+
+def get_cache_times(store, analyses) -> dict:
+    return {a: os.stat(f"{get_summary_dir(store)}/{a}.json").st_mtime_ns for a in analyses}
+
+
+def test_update_cohort_only_recomputes_changed(tmp_path):
+    store = str(tmp_path)
+    analyses = ['seal_01', 'seal_02']
+    write_feature(store, 'seal_01', np.arange(10.0))
+    # a feature without a single value summarizes to NaN statistics
+    write_feature(store, 'seal_02', np.full(10, np.nan))
+
+    table = update_cohort(analyses, store, workers=1)
+    assert table.loc['seal_01', 'EEG1.delta_power.mean'] == 4.5
+    assert np.isnan(table.loc['seal_02', 'EEG1.delta_power.mean'])
+    written = get_cache_times(store, analyses)
+
+    # nothing changed, everything comes from the cache, NaN included
+    cached = update_cohort(analyses, store, workers=1)
+    pd.testing.assert_frame_equal(cached, table)
+    assert get_cache_times(store, analyses) == written
+
+    write_feature(store, 'seal_01', np.arange(20.0))
+    updated = update_cohort(analyses, store, workers=1)
+    assert updated.loc['seal_01', 'EEG1.delta_power.mean'] == 9.5
+    times = get_cache_times(store, analyses)
+    assert times['seal_01'] != written['seal_01']
+    assert times['seal_02'] == written['seal_02']
@@ -0,0 +1,57 @@
+"""
+Heart rate variability of beat series with known intervals.
+"""
+import numpy as np
+import pytest
+
+from synthetic import START_TS
+from utils.EventSeries import EventSeries
+
+
+def make_beats(intervals, offset=0.0) -> EventSeries:
+    """
+    One event per beat-to-beat interval, ending at the next beat
+    """
+    beats = offset + np.concatenate(([0], np.cumsum(intervals)))
+    return EventSeries(START_TS, 'heart_rate', beats[:-1], 60 / np.asarray(intervals), ends=beats[1:])
+
+
+def test_rmssd_and_sdnn():
+    intervals = np.tile([0.8, 1.0], 50)
+    beats = make_beats(intervals)
+    assert beats.get_rmssd() == pytest.approx(200)
+    assert beats.get_sdnn() == pytest.approx(np.std(intervals * 1000, ddof=1))
+
+
+def test_rmssd_ignores_differences_across_gaps():
+    # each run is steady, only the jump between them differs
+    first, second = make_beats(np.full(30, 0.8)), make_beats(np.full(30, 1.0), offset=60)
+    beats = EventSeries(START_TS, 'heart_rate', np.concatenate((first.times, second.times)),
+                        np.concatenate((first.values, second.values)),
+                        ends=np.concatenate((first.ends, second.ends)))
+    assert beats.get_rmssd() == pytest.approx(0)
+
+
+@pytest.mark.parametrize('modulation, low', [(0.1, True), (0.25, False)])
+def test_lf_hf(modulation, low):
+    # intervals modulated in the LF (0.04-0.15 Hz) or HF (0.15-0.4 Hz) band
+    intervals, t = [], 0.0
+    while t < 300:
+        intervals.append(0.8 + 0.05 * np.sin(2 * np.pi * modulation * t))
+        t += intervals[-1]
+    ratio = make_beats(intervals).get_lf_hf()
+    assert ratio > 5 if low else ratio < 0.2
+
+
+def test_lf_hf_needs_two_minutes():
+    beats = make_beats(np.full(100, 0.8))
+    assert np.isnan(beats.time_slice(0, 60).get_lf_hf())
+
+
+def test_apply_windows():
+    beats = make_beats(np.tile([0.8, 1.0], 100))
+    starts = np.array([0.0, 36.0, np.nan])
+    rmssd = beats.apply_windows(starts, starts + 36, EventSeries.get_rmssd)
+    assert rmssd[:2] == pytest.approx([200, 200])
+    assert np.isnan(rmssd[2])
+    assert beats.sample(np.array([0.5, 1.0, 500.0])).tolist() == [75.0, 60.0, 0.0]
@@ -0,0 +1,115 @@
+"""
+End to end run of FeatureRunner on small synthetic EDF files, checking that
+every configured feature covers the whole configured time range.
+
+    python -m pytest tests
+"""
+import os
+import json
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import pytest
+
+from synthetic import START_TS, FREQS, write_edf, make_signals
+from utils.AnalysisStore import AnalysisStore
+from utils.FeatureRunner import FeatureRunner
+from utils.RawCache import RawCache
+
+DURATION = 300
+FEATURES = [
+    {'name': 'delta_power', 'group': 'EEG', 'method': 'get_rolling_band_power_welch',
+     'kwargs': {'freq_range': [0.5, 4], 'window_sec': 30, 'step_size': 1}},
+    {'name': 'zero_crossings', 'group': 'EEG', 'method': 'get_rolling_zero_crossings',
+     'kwargs': {'window_sec': 10, 'step_size': 1}},
+    {'name': 'heart_rate', 'group': 'ECG', 'method': 'get_heart_rate', 'kwargs': {}},
+]
+
+
+def make_analysis(store, segments, cache=False, gap=0) -> str:
+    """
+    Writes DURATION seconds of recording split into `segments` EDF files
+    `gap` seconds apart, with the time range set to the whole analysis as
+    ConfigureEDF does by default
+    """
+    analysis = 'synthetic'
+    analysis_dir = f"{store}/{analysis}"
+    os.makedirs(analysis_dir)
+    length = DURATION // segments
+    for i in range(segments):
+        path = f"{analysis_dir}/segment{i}.edf"
+        write_edf(path, START_TS + timedelta(seconds=i * (length + gap)), make_signals(length, i * length), length)
+        if cache:
+            RawCache.build(path)
+    config = {
+        'channels': {'map': {'EEG': ['EEG1'], 'ECG': ['ECG']}},
+        'time': {'start': START_TS, 'end': START_TS + timedelta(seconds=DURATION + (segments - 1) * gap)},
+        'features': FEATURES,
+    }
+    with open(f"{analysis_dir}/{FeatureRunner.CONFIG_NAME}", 'w') as f:
+        json.dump(config, f, default=str)
+    AnalysisStore.refresh_analysis(analysis, store)
+    return analysis
+
+
+def read_output(runner, channel, name) -> np.array:
+    path = FeatureRunner.get_output_path(runner.output_dir, channel, name)
+    return pd.read_csv(path).iloc[:, 1].to_numpy()
+
+
+@pytest.mark.parametrize('segments, cache, gap', [(1, False, 0), (1, True, 0), (2, False, 0), (2, False, 20)])
+def test_run_covers_time_range(tmp_path, segments, cache, gap):
+    store = str(tmp_path)
+    analysis = make_analysis(store, segments, cache, gap)
+    runner = FeatureRunner(analysis, store=store)
+    summary = runner.run()
+    duration = DURATION + (segments - 1) * gap
+
+    assert summary['failed'] == 0, summary['errors']
+    assert summary['computed'] == len(FEATURES)
+    # each channel counts once however many features are computed from it,
+    # gaps between segments are read as NaN samples
+    assert summary['samples'] == duration * sum(FREQS.values())
+    for channel, feature, path in runner.get_tasks():
+        output = pd.read_csv(path)
+        assert len(output) == duration, f"{channel}.{feature['name']}"
+        assert output.iloc[:, 1].notna().any(), f"{channel}.{feature['name']}"
+
+    # the synthetic ECG beats every 0.8 seconds, heart rate is 0 where no beats are found
+    heart_rate = read_output(runner, 'ECG', 'heart_rate')
+    beats = heart_rate[heart_rate > 0]
+    assert np.all((beats > 30) & (beats < 250))
+    assert np.median(beats) == pytest.approx(75, abs=1)
+    assert (heart_rate > 0).mean() > 0.9 * (duration - gap) / duration
+
+    if gap:
+        gap_start, gap_end = DURATION // segments, DURATION // segments + gap
+        assert np.all(heart_rate[gap_start + 2:gap_end - 2] == 0)
+        assert (heart_rate[2:gap_start - 2] > 0).all() and (heart_rate[gap_end + 2:] > 0).all()
+        # counting windows overlapping the gap are missing, not counted as 0
+        zero_crossings = read_output(runner, 'EEG1', 'zero_crossings')
+        assert np.isnan(zero_crossings[gap_start:gap_end]).all()
+        assert np.isfinite(zero_crossings[10:gap_start - 5]).all()
+
+
+def test_rerun_recomputes_stale_outputs(tmp_path):
+    store = str(tmp_path)
+    analysis = make_analysis(store, 1)
+    assert FeatureRunner(analysis, store=store).run()['computed'] == len(FEATURES)
+    assert FeatureRunner(analysis, store=store).run()['skipped'] == len(FEATURES)
+
+    # changed parameters of one feature
+    config_path = f"{store}/{analysis}/{FeatureRunner.CONFIG_NAME}"
+    with open(config_path) as f:
+        config = json.load(f)
+    config['features'][1]['kwargs']['window_sec'] = 20
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+    summary = FeatureRunner(analysis, store=store).run()
+    assert (summary['computed'], summary['skipped']) == (1, len(FEATURES) - 1)
+
+    # replaced EDF
+    path = f"{store}/{analysis}/segment0.edf"
+    write_edf(path, START_TS, make_signals(DURATION, 1.0), DURATION + 1)
+    summary = FeatureRunner(analysis, store=store).run()
+    assert summary['computed'] == len(FEATURES)
@@ -0,0 +1,75 @@
+"""
+Deduplication and cancellation of background jobs.
+"""
+import time
+import threading
+
+from utils.Jobs import JobManager, report_progress
+
+
+def wait_for(condition, timeout=5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_identical_jobs_run_once():
+    manager = JobManager(max_workers=2)
+    release = threading.Event()
+    runs = []
+
+    def work(value):
+        runs.append(value)
+        release.wait(5)
+        return value * 2
+
+    job = manager.submit('key', work, 21)
+    assert manager.submit('key', work, 21) is job
+    release.set()
+    wait_for(lambda: job.status == 'done')
+    assert manager.submit('key', work, 21) is job
+    assert job.result == 42
+    assert runs == [21]
+
+    # a forgotten job is computed again
+    manager.forget('key')
+    again = manager.submit('key', work, 21)
+    assert again is not job
+    wait_for(lambda: again.status == 'done')
+    assert runs == [21, 21]
+
+
+def test_cancel_running_job():
+    manager = JobManager(max_workers=1)
+    started = threading.Event()
+
+    def work():
+        started.set()
+        while True:
+            report_progress(0.5)
+            time.sleep(0.01)
+
+    job = manager.submit('key', work)
+    started.wait(5)
+    manager.cancel('key')
+    wait_for(lambda: job.status == 'cancelled')
+    assert job.finished is not None
+
+    # a cancelled job is replaced by a fresh submission
+    again = manager.submit('key', lambda: 'done')
+    assert again is not job
+    wait_for(lambda: again.status == 'done')
+    assert again.result == 'done'
+
+
+def test_failed_job_keeps_error():
+    manager = JobManager(max_workers=1)
+
+    def work():
+        raise ValueError('bad input')
+
+    job = manager.submit('key', work)
+    wait_for(lambda: not job.active)
+    assert job.status == 'failed'
+    assert isinstance(job.error, ValueError)
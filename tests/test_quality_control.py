@@ -0,0 +1,54 @@
+"""
+Quality control flags of a synthetic night: sustained slow waves are not
+spikes, a short burst is, and only flat, clipped and dropout epochs are
+skipped by the rolling features.
+"""
+import os
+import numpy as np
+
+from synthetic import START_TS, write_edf
+from utils.EDF import open_edf
+from utils.QualityControl import QualityMask
+
+FREQ = 200
+DURATION = 600
+
+
+def make_recording(path) -> None:
+    rng = np.random.default_rng(1)
+    t = np.arange(DURATION * FREQ) / FREQ
+    eeg = 10 * rng.standard_normal(len(t))
+    # two minutes of high amplitude delta, as in slow-wave sleep
+    bout = (t >= 200) & (t < 320)
+    eeg[bout] += 100 * np.sin(2 * np.pi * 1 * t[bout])
+    # a 3 second movement artifact
+    eeg[450 * FREQ:453 * FREQ] = 300 * rng.standard_normal(3 * FREQ)
+    # 10 seconds of a disconnected electrode
+    eeg[520 * FREQ:530 * FREQ] = 0
+    write_edf(path, START_TS, {'EEG1': (FREQ, eeg)}, DURATION)
+
+
+def test_flags(tmp_path):
+    path = f"{tmp_path}/rec.edf"
+    make_recording(path)
+    mask = QualityMask.scan([path])
+
+    assert mask.get_bad_intervals('EEG1', flags=['spike']) == [(450.0, 453.0, ['spike'])]
+    assert mask.get_bad_intervals('EEG1', flags=['flat']) == [(520.0, 530.0, ['flat'])]
+    assert not mask.get_flagged('EEG1', flags=['clipped', 'dropout']).any()
+
+
+def test_features_skip_only_skip_flags(tmp_path):
+    path = f"{tmp_path}/rec.edf"
+    make_recording(path)
+    QualityMask.scan([path]).write(os.path.dirname(path))
+    channel = open_edf(path)['EEG1']
+    assert channel.quality is not None
+
+    zero_crossings = channel.get_rolling_zero_crossings(window_sec=4, step_size=1).signal
+    # the spike is reported but its windows are still computed
+    assert np.isfinite(zero_crossings[445:458]).all()
+    assert np.isfinite(zero_crossings[200:320]).all()
+    # windows overlapping the flat epochs are skipped
+    assert np.isnan(zero_crossings[520:530]).all()
+    assert np.isfinite(zero_crossings[540:590]).all()
@@ -0,0 +1,43 @@
+"""
+Channels read through the raw signal cache are identical to those read by mne.
+"""
+from datetime import timedelta
+import numpy as np
+import pytest
+
+from synthetic import START_TS, FREQS, write_edf, make_signals
+from utils.EDF import open_edf
+from utils.RawCache import RawCache
+
+
+@pytest.mark.parametrize('time_range', [None, (0, 40), (15, 50)])
+def test_cache_matches_mne(tmp_path, time_range):
+    path = f"{tmp_path}/rec.edf"
+    write_edf(path, START_TS, make_signals(60), 60)
+    uncached = open_edf(path)
+    assert uncached.cache is None
+    # chunks smaller than the recording so ranges span several of them
+    RawCache.build(path, chunk_samples=4096)
+    cached = open_edf(path)
+    assert cached.cache is not None
+
+    for edf in (uncached, cached):
+        if time_range is not None:
+            edf.set_date_range(START_TS + timedelta(seconds=time_range[0]),
+                               START_TS + timedelta(seconds=time_range[1]))
+    for channel in ('EEG1', 'ECG'):
+        expected, result = uncached[channel], cached[channel]
+        np.testing.assert_array_equal(result.signal, expected.signal)
+        np.testing.assert_array_equal(result.time, expected.time)
+        assert result.start_ts == expected.start_ts
+        np.testing.assert_array_equal(cached.read_signal(channel, 1000, 9000),
+                                      uncached.read_signal(channel, 1000, 9000))
+
+
+def test_cache_ignored_after_edf_changes(tmp_path):
+    path = f"{tmp_path}/rec.edf"
+    write_edf(path, START_TS, make_signals(60), 60)
+    RawCache.build(path)
+    write_edf(path, START_TS, make_signals(30), 30)
+    assert RawCache.load(path) is None
+    assert len(open_edf(path)['EEG1'].signal) == 30 * FREQS['EEG1']
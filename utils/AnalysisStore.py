@@ -0,0 +1,144 @@
+import os
+import json
+import config as cfg
+
+# in-process copy of each store's catalog, keyed by store path and
+# invalidated by the catalog file's modification time
+_CATALOG_CACHE = {}
+
+
+class AnalysisStore:
+    """
+    Filesystem helpers for the analysis directories in `cfg.ANALYSIS_STORE`.
+    Kept free of Streamlit so they can be shared by the app and headless tools.
+
+    The analyses and their EDF files are tracked in a small catalog at
+    `<store>/.catalog/catalog.json` so the app does not need to list
+    directories on every rerun. Catalog entries are validated against the
+    directory modification times and refreshed when they go stale.
+    """
+    CATALOG_DIR = '.catalog'
+    CATALOG_NAME = 'catalog.json'
+
+    @staticmethod
+    def get_catalog_path(store=cfg.ANALYSIS_STORE) -> str:
+        return f"{store}/{AnalysisStore.CATALOG_DIR}/{AnalysisStore.CATALOG_NAME}"
+
+    @staticmethod
+    def scan_analysis(analysis: str, store=cfg.ANALYSIS_STORE) -> dict:
+        analysis_dir = AnalysisStore.get_analysis_dir(analysis, store)
+        edfs = sorted(f for f in os.listdir(analysis_dir) if f.split('.')[-1].lower() == 'edf')
+        return {'mtime_ns': os.stat(analysis_dir).st_mtime_ns, 'edfs': edfs}
+
+    @staticmethod
+    def read_catalog(store=cfg.ANALYSIS_STORE) -> dict | None:
+        path = AnalysisStore.get_catalog_path(store)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = _CATALOG_CACHE.get(store)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        with open(path) as f:
+            catalog = json.load(f)
+        _CATALOG_CACHE[store] = (mtime_ns, catalog)
+        return catalog
+
+    @staticmethod
+    def write_catalog(catalog: dict, store=cfg.ANALYSIS_STORE) -> None:
+        # the catalog lives in a subdirectory so that writing it does not
+        # change the modification time of the store it describes
+        os.makedirs(f"{store}/{AnalysisStore.CATALOG_DIR}", exist_ok=True)
+        catalog['mtime_ns'] = os.stat(store).st_mtime_ns
+        path = AnalysisStore.get_catalog_path(store)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(catalog, f)
+        os.replace(tmp_path, path)
+        _CATALOG_CACHE[store] = (os.stat(path).st_mtime_ns, catalog)
+
+    @staticmethod
+    def load_catalog(store=cfg.ANALYSIS_STORE) -> dict:
+        """
+        Returns the catalog of the store, rebuilding it if analyses were added
+        or removed since it was written.
+        """
+        catalog = AnalysisStore.read_catalog(store)
+        if catalog is not None and catalog['mtime_ns'] == os.stat(store).st_mtime_ns:
+            return catalog
+
+        previous = catalog['analyses'] if catalog else {}
+        analyses = {}
+        for name in os.listdir(store):
+            if name.startswith('.') or not os.path.isdir(f"{store}/{name}"):
+                continue
+            entry = previous.get(name)
+            if entry is None or entry['mtime_ns'] != os.stat(f"{store}/{name}").st_mtime_ns:
+                entry = AnalysisStore.scan_analysis(name, store)
+            analyses[name] = entry
+        catalog = {'analyses': analyses}
+        AnalysisStore.write_catalog(catalog, store)
+        return catalog
+
+    @staticmethod
+    def refresh_analysis(analysis: str, store=cfg.ANALYSIS_STORE) -> dict:
+        """
+        Rescans one analysis directory and records it in the catalog,
+        returns its catalog entry.
+        """
+        catalog = AnalysisStore.load_catalog(store)
+        entry = AnalysisStore.scan_analysis(analysis, store)
+        catalog['analyses'][analysis] = entry
+        AnalysisStore.write_catalog(catalog, store)
+        return entry
+
+    @staticmethod
+    def get_catalog_entry(analysis: str, store=cfg.ANALYSIS_STORE) -> dict | None:
+        catalog = AnalysisStore.load_catalog(store)
+        entry = catalog['analyses'].get(analysis)
+        if entry is None:
+            return None
+        analysis_dir = AnalysisStore.get_analysis_dir(analysis, store)
+        if entry['mtime_ns'] != os.stat(analysis_dir).st_mtime_ns:
+            entry = AnalysisStore.refresh_analysis(analysis, store)
+        return entry
+
+    @staticmethod
+    def get_existing_analyses(store=cfg.ANALYSIS_STORE) -> list:
+        return sorted(AnalysisStore.load_catalog(store)['analyses'])
+
+    @staticmethod
+    def get_analysis_dir(analysis: str, store=cfg.ANALYSIS_STORE) -> str:
+        return f"{store}/{analysis}"
+
+    @staticmethod
+    def get_edf_from_analysis(analysis: str, path=False, store=cfg.ANALYSIS_STORE) -> str | None:
+        entry = AnalysisStore.get_catalog_entry(analysis, store)
+        if entry is None or not entry['edfs']:
+            return None
+        file = entry['edfs'][0]
+        return f"{store}/{analysis}/{file}" if path else file
+
+    @staticmethod
+    def get_edfs_from_analysis(analysis: str, path=False, store=cfg.ANALYSIS_STORE) -> list:
+        """
+        All EDF files of an analysis (an analysis may hold several consecutive
+        segments of one recording, see utils.EDF.EDFSet)
+        """
+        entry = AnalysisStore.get_catalog_entry(analysis, store)
+        if entry is None:
+            return []
+        return [f"{store}/{analysis}/{file}" if path else file for file in entry['edfs']]
+
+    @staticmethod
+    def read_configuration(analysis: str, name, store=cfg.ANALYSIS_STORE) -> dict | None:
+        """
+        Reads a JSON configuration written by `SessionBase.write_configuration`,
+        returns None if it does not exist.
+        """
+        path = f"{store}/{analysis}/{name}"
+        if not os.path.isfile(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
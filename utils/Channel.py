@@ -1,22 +1,66 @@
 import numpy as np
-import pandas as pd
 from datetime import timedelta
 import inspect
-from typing import Self
-import mne
-import wfdb.processing
-from sleepecg import detect_heartbeats
-from scipy.integrate import simpson
-from scipy.signal import welch
-from scipy.signal.windows import hann
+from functools import lru_cache
+from typing import Self, TYPE_CHECKING
+from utils.Jobs import report_progress
+import utils.Counting as counting
+# pandas and the scientific stacks (mne, wfdb, sleepecg, scipy) are imported
+# inside the methods that use them: every Streamlit page imports this module
+# indirectly and should not pay their import cost until a computation runs.
+if TYPE_CHECKING:
+    import pandas as pd
+    from utils.QualityControl import QualityMask
+    from utils.Checkpoint import Checkpoint
+    from utils.EventSeries import EventSeries
+
+
+@lru_cache(maxsize=64)
+def design_filter(freq, freq_range, kind='iir', order=4):
+    """
+    Designs (and caches) a bandpass filter. A missing/zero lower bound gives a
+    lowpass and an upper bound at or above Nyquist gives a highpass.
+    Returns second-order sections for 'iir' and FIR taps for 'fir'.
+    freq: sampling frequency of the signal to filter
+    freq_range: tuple of (lower, upper) cutoffs in Hz
+    kind: 'iir' (Butterworth) or 'fir' (Hamming windowed)
+    order: IIR filter order, or number of FIR taps (made odd)
+    """
+    from scipy.signal import butter, firwin
+
+    nyquist = freq / 2
+    low, high = freq_range
+    low = low if low else None
+    high = high if high and high < nyquist else None
+    if low is None and high is None:
+        raise ValueError(f"Frequency range {freq_range} does not constrain a {freq} Hz signal")
+
+    if kind == 'iir':
+        if low and high:
+            return butter(order, (low, high), btype='bandpass', fs=freq, output='sos')
+        elif high:
+            return butter(order, high, btype='lowpass', fs=freq, output='sos')
+        return butter(order, low, btype='highpass', fs=freq, output='sos')
+    elif kind == 'fir':
+        numtaps = order + 1 - order % 2
+        if low and high:
+            return firwin(numtaps, (low, high), pass_zero=False, fs=freq)
+        elif high:
+            return firwin(numtaps, high, fs=freq)
+        return firwin(numtaps, low, pass_zero=False, fs=freq)
+    raise ValueError(f"Filter kind must be 'iir' or 'fir', not {kind}")
 
 
 class Channel:
-    def __init__(self, start_ts, name: str, signal: np.array, end_ts=None, time:np.array=None, freq=None) -> None:
+    def __init__(self, start_ts, name: str, signal: np.array, end_ts=None, time:np.array=None, freq=None,
+                 quality: 'QualityMask' = None) -> None:
         self.name = name
         self.time = time
         self.signal = signal
         self.freq = freq
+        # quality control mask of the analysis, rolling features skip the
+        # windows overlapping epochs it flags, see _get_window_bounds
+        self.quality = quality
 
         self.start_ts = start_ts
         self.end_ts = end_ts if end_ts else self.start_ts + timedelta(seconds=time[-1])
@@ -43,7 +87,8 @@ class Channel:
             time=slice_time,
             freq=freq,
             start_ts=self.start_ts,
-            end_ts=self.end_ts
+            end_ts=self.end_ts,
+            quality=self.quality
         )
     
     def time_slice(self, start_time, end_time, unit='second') -> Self:
@@ -75,6 +120,7 @@ class Channel:
         start_date: start date in the form of a string or datetime object
         end_date: end date in the form of a string or datetime object
         """
+        import pandas as pd
         recording_start_ts = self.start_ts.timestamp()
         start_ts = pd.to_datetime(start_date).timestamp()
         end_ts = pd.to_datetime(end_date).timestamp()
@@ -94,7 +140,8 @@ class Channel:
             time=slice_time,
             freq=self.freq,
             start_ts=self.start_ts,
-            end_ts=self.end_ts
+            end_ts=self.end_ts,
+            quality=self.quality
         )
 
     
@@ -110,10 +157,10 @@ class Channel:
         # inspect.stack()[1][3] returns the name of the function
         # traced back before this function call
         new_name = f'{self.name}.{inspect.stack()[1][3]}'
-        new_time = self.time[::self.freq//step_size]
+        new_time = self.time[::int(self.freq*step_size)]
         new_freq = 1/step_size
         return Channel(
-            start_ts=self._start_ts,
+            start_ts=self.start_ts,
             name=new_name,
             signal=new_signal,
             time=new_time,
@@ -121,24 +168,104 @@ class Channel:
             # TODO support for non-integer frequencies?
         )
     
-    def to_DataFrame(self) -> pd.DataFrame:
+    def to_DataFrame(self) -> 'pd.DataFrame':
         """
         Returns 2-column pandas DataFrame of time and signal
         """
+        import pandas as pd
         assert len(self.signal) == len(self.time)
         return pd.DataFrame(
             data=np.array([self.time, self.signal]).T,
             columns=['time', self.name]
         )
 
+    def filter(self, freq_range, kind='iir', order=4) -> Self:
+        """
+        Zero-phase (forward-backward) filter of Channel.signal, returns a new
+        Channel instance at the same frequency
+        freq_range: (lower, upper) passband in Hz, use None/0 or Nyquist to leave a side open
+        kind: 'iir' (Butterworth) or 'fir' (Hamming windowed), see design_filter
+        order: IIR filter order, or number of FIR taps
+        """
+        from scipy.signal import sosfiltfilt, filtfilt
+
+        coefficients = design_filter(self.freq, tuple(freq_range), kind, order)
+        if kind == 'iir':
+            filtered = sosfiltfilt(coefficients, self.signal)
+        else:
+            filtered = filtfilt(coefficients, 1.0, self.signal)
+        return Channel(
+            start_ts=self.start_ts,
+            name=self.name,
+            signal=filtered,
+            time=self.time,
+            freq=self.freq,
+            end_ts=self.end_ts,
+            quality=self.quality
+        )
+
+    def decimate(self, factor: int) -> Self:
+        """
+        Downsamples Channel.signal by an integer factor with an anti-aliasing
+        polyphase FIR filter. Returns a new Channel instance at freq/factor
+        factor: integer decimation factor
+        """
+        from scipy.signal import resample_poly
+
+        if factor == 1:
+            return self
+        freq = self.freq / factor
+        return Channel(
+            start_ts=self.start_ts,
+            name=self.name,
+            signal=resample_poly(self.signal, up=1, down=factor),
+            time=self.time[::factor],
+            freq=int(freq) if freq.is_integer() else freq,
+            end_ts=self.end_ts,
+            quality=self.quality
+        )
+
+    def get_decimation_factor(self, freq_range, oversample=4, window_sec=None, step_size=None) -> int:
+        """
+        Largest integer factor that divides Channel.freq and keeps the output
+        frequency at least `oversample` times the upper edge of freq_range.
+        If window_sec/step_size are given, the decimated rate must also give
+        an even number of samples per window and a whole number per step,
+        as required by _apply_rolling.
+        """
+        for factor in range(int(self.freq), 1, -1):
+            new_freq = self.freq / factor
+            if not new_freq.is_integer() or new_freq < oversample * freq_range[1]:
+                continue
+            if window_sec is not None and (new_freq * window_sec) % 2 != 0:
+                continue
+            if step_size is not None and not float(new_freq * step_size).is_integer():
+                continue
+            return factor
+        return 1
+
+    def band_limit(self, freq_range, oversample=4, bandpass=False,
+                   window_sec=None, step_size=None) -> Self:
+        """
+        Reduces Channel.signal to the lowest sample rate that still resolves
+        freq_range, see get_decimation_factor. Returns self if no reduction is possible.
+        freq_range: (lower, upper) band of interest in Hz
+        oversample: minimum ratio of the new sampling frequency to the upper band edge
+        bandpass: also apply a zero-phase bandpass over freq_range before decimating
+        """
+        factor = self.get_decimation_factor(freq_range, oversample, window_sec, step_size)
+        source = self.filter(freq_range) if bandpass else self
+        return source.decimate(factor)
+
     def get_rolling_mean(self, window_sec=30, step_size=1) -> Self:
         """
         Calculate rolling mean over Channel.signal. Returns new Channel instance
         window_sec: window size for rolling mean in seconds
         step_size: step over which to resample the output Channel
         """
+        import pandas as pd
         rolling_mean = pd.Series(self.signal).rolling(window_sec*self.freq, center=True)\
-            .mean()[::self.freq].values
+            .mean()[::int(self.freq*step_size)].values
         return self._return(rolling_mean, step_size)
 
     def get_rolling_std(self, window_sec=30, step_size=1) -> Self:
@@ -148,34 +275,48 @@ class Channel:
         window_sec: window size for rolling std in seconds
         step_size: step over which to resample the output Channel
         """
+        import pandas as pd
         rolling_std = pd.Series(self.signal).rolling(window_sec*self.freq, center=True)\
-            .std()[::self.freq].values
+            .std()[::int(self.freq*step_size)].values
         return self._return(rolling_std, step_size)
     
-    def _apply_rolling(self, window_sec, step_size, process) -> np.array:
+    def _apply_rolling(self, window_sec, step_size, process, checkpoint: 'Checkpoint' = None) -> np.array:
         """
         Generalized pattern to apply a transformation over a rolling window.
         window_sec: window size for applied process in seconds
         step_size: step over which to resample the signal frequency
         process: function to apply over the rolling window
+        checkpoint: saves the output periodically, and when interrupted, to
+            resume from the last completed window, see utils.Checkpoint
         """
-        window_length = window_sec * self.freq
-        step_idx = int(step_size * self.freq)
-
-        accum = []
-        for i in range(0, len(self.signal), step_idx):
-            window_start = i - window_length//2
-            window_end = i + window_length//2
-            if window_start < 0:
-                accum.append(np.nan)
-            elif window_end > len(self.signal):
-                accum.append(np.nan)
-            else:
-                accum.append(process(self.signal, window_start, window_end))
-        return np.array(accum)
+        starts, ends, valid = self._get_window_bounds(window_sec, step_size)
+        windows = np.flatnonzero(valid)
+        accum = np.full(len(starts), np.nan)
+        done = 0
+        if checkpoint is not None:
+            checkpoint.bind(self, window_sec, step_size)
+            saved = checkpoint.load()
+            if saved is not None:
+                accum, done = saved
+        try:
+            for count in range(done, len(windows)):
+                n = windows[count]
+                if count % 256 == 0:
+                    # lets a background job show progress and stop on cancellation
+                    report_progress(n / len(starts))
+                accum[n] = process(self.signal, starts[n], ends[n])
+                done = count + 1
+                if checkpoint is not None:
+                    checkpoint.save_if_due(accum, done)
+        finally:
+            if checkpoint is not None:
+                # also on cancellation or errors, so the next run resumes here
+                checkpoint.save(accum, done)
+        return accum
 
     def get_rolling_band_power_multitaper(self, freq_range=(0.5, 4), ref_power=1e-13,
-                                          window_sec=2, step_size=1, in_dB=True) -> Self:
+                                          window_sec=2, step_size=1, in_dB=True, decimate=False,
+                                          checkpoint: 'Checkpoint' = None) -> Self:
         """
         Gets rolling band power for specified frequency range, data frequency and window size
         freq_range: range of frequencies in form of (lower, upper) to calculate power of
@@ -183,7 +324,22 @@ class Channel:
         window_sec: window size in seconds to calculate delta power (if the window is longer than the step size there will be overlap)
         step_size: step size in seconds to calculate delta power in windows (if 1, function returns an array with 1Hz power calculations)
         in_dB: boolean for whether to convert the output into decibals
+        decimate: compute on a copy downsampled to the band of interest, see band_limit.
+            Faster, but the adaptive taper weights depend on the total power of the
+            window, so this shifts the estimate by several percent when most of it
+            lies outside the band (strong tones, line noise). Only for broadband signals
+        checkpoint: save progress to resume an interrupted run, see _apply_rolling
         """
+        import mne
+        from scipy.integrate import simpson
+
+        if decimate:
+            source = self.band_limit(freq_range, window_sec=window_sec, step_size=step_size)
+            if source is not self:
+                rolling_band_power = source.get_rolling_band_power_multitaper(
+                    freq_range, ref_power, window_sec, step_size, in_dB, decimate=False, checkpoint=checkpoint)
+                return self._return(rolling_band_power.signal, step_size=step_size)
+
         def get_band_power_multitaper(a, start, end) -> np.array:
             a = a[start:end]
             # TODO: maybe edit this later so there is a buffer before and after?
@@ -205,35 +361,104 @@ class Channel:
         rolling_band_power = self._apply_rolling(
             window_sec=window_sec,
             step_size=step_size,
-            process=get_band_power_multitaper
+            process=get_band_power_multitaper,
+            checkpoint=checkpoint
         )
         return self._return(rolling_band_power, step_size=step_size)
 
+    def _get_window_bounds(self, window_sec, step_size) -> tuple:
+        """
+        Sample bounds (starts, ends, valid) of the rolling windows, see
+        counting.get_window_bounds. Windows overlapping an epoch flagged flat,
+        clipped or dropout by the quality control scan are invalid, so features
+        are NaN there and the expensive ones are never computed.
+        """
+        starts, ends, valid = counting.get_window_bounds(len(self.signal), self.freq, window_sec, step_size)
+        if self.quality is not None:
+            valid &= ~self.quality.get_bad_windows(self.name, self.time, starts, ends,
+                                                   flags=self.quality.SKIP_FLAGS)
+        return starts, ends, valid
+
     def get_rolling_zero_crossings(self, window_sec=1, step_size=1) -> Self:
         """
         Get the zero-crossings of an array with a rolling window
         window_sec: window in seconds
         step_size: step size in seconds (step_size of 1 would mean returend data will be 1 Hz)
         """
-
-        def get_crossing(a, start, end):
-            return ((a[start:end-1] * a[start+1:end]) < 0).sum()
-        
-        rolling_zero_crossings = self._apply_rolling(
-            window_sec=window_sec,
-            step_size=step_size,
-            process=get_crossing
-        )
+        bounds = self._get_window_bounds(window_sec, step_size)
+        rolling_zero_crossings = counting.count_pairs(counting.sign_changes(self.signal), *bounds,
+                                                      missing=np.isnan(self.signal))
         return self._return(rolling_zero_crossings, step_size=step_size)
+
+    def get_rolling_threshold_crossings(self, threshold, direction='both', window_sec=1, step_size=1) -> Self:
+        """
+        Get the number of times the signal crosses a threshold with a rolling window
+        threshold: value to count crossings of
+        direction: count 'up' crossings, 'down' crossings or 'both'
+        window_sec: window in seconds
+        step_size: step size in seconds
+        """
+        bounds = self._get_window_bounds(window_sec, step_size)
+        crossings = counting.threshold_crossings(self.signal, threshold, direction)
+        rolling_crossings = counting.count_pairs(crossings, *bounds, missing=np.isnan(self.signal))
+        return self._return(rolling_crossings, step_size=step_size)
+
+    def get_rolling_peak_count(self, height=None, window_sec=1, step_size=1) -> Self:
+        """
+        Get the number of local maxima of the signal with a rolling window
+        height: only count peaks at or above this value
+        window_sec: window in seconds
+        step_size: step size in seconds
+        """
+        bounds = self._get_window_bounds(window_sec, step_size)
+        rolling_peaks = counting.count_peaks(counting.local_maxima(self.signal, height), *bounds,
+                                             missing=np.isnan(self.signal))
+        return self._return(rolling_peaks, step_size=step_size)
+
+    def get_rolling_hjorth_mobility(self, window_sec=30, step_size=1) -> Self:
+        """
+        Hjorth mobility, sqrt(var(signal') / var(signal)), with a rolling window
+        window_sec: window in seconds
+        step_size: step size in seconds
+        """
+        bounds = self._get_window_bounds(window_sec, step_size)
+        _, mobility, _ = counting.rolling_hjorth(self.signal, *bounds)
+        return self._return(mobility, step_size=step_size)
+
+    def get_rolling_hjorth_complexity(self, window_sec=30, step_size=1) -> Self:
+        """
+        Hjorth complexity, mobility(signal') / mobility(signal), with a rolling window
+        window_sec: window in seconds
+        step_size: step size in seconds
+        """
+        bounds = self._get_window_bounds(window_sec, step_size)
+        _, _, complexity = counting.rolling_hjorth(self.signal, *bounds)
+        return self._return(complexity, step_size=step_size)
   
-    def get_rolling_band_power_fourier_sum(self, freq_range=(0.5, 4), ref_power=0.001, window_sec=2, step_size=1) -> Self:
+    def get_rolling_band_power_fourier_sum(self, freq_range=(0.5, 4), ref_power=0.001, window_sec=2, step_size=1,
+                                           decimate=False, checkpoint: 'Checkpoint' = None) -> Self:
         """
         Gets rolling band power for specified frequency range, data frequency and window size
         freq_range: range of frequencies in form of (lower, upper) to calculate power of
         ref_power: arbitrary reference power to divide the windowed delta power by (used for scaling)
         window_sec: window size in seconds to calculate delta power (if the window is longer than the step size there will be overlap)
         step_size: step size in seconds to calculate delta power in windows (if 1, function returns an array with 1Hz power calculations)
+        decimate: compute on a copy downsampled to the band of interest, see band_limit.
+            Faster; against the full-rate estimate the median window differs by
+            up to about 2% and single windows by up to ~10% (measured by
+            benchmarks/verify_fast_paths.py)
+        checkpoint: save progress to resume an interrupted run, see _apply_rolling
         """
+        if decimate:
+            source = self.band_limit(freq_range, window_sec=window_sec, step_size=step_size)
+            if source is not self:
+                rolling_band_power = source.get_rolling_band_power_fourier_sum(
+                    freq_range, ref_power, window_sec, step_size, decimate=False, checkpoint=checkpoint)
+                # the unnormalized FFT power scales with the squared number of
+                # samples per window, rescale to the full-rate equivalent
+                factor = self.freq / source.freq
+                return self._return(rolling_band_power.signal * factor**2, step_size=step_size)
+
         def get_band_power_fourier_sum(a, start, end) -> np.array:
             a = a[start:end]
             """
@@ -256,18 +481,36 @@ class Channel:
         rolling_band_power = self._apply_rolling(
             window_sec=window_sec,
             step_size=step_size,
-            process=get_band_power_fourier_sum
+            process=get_band_power_fourier_sum,
+            checkpoint=checkpoint
         )
         return self._return(rolling_band_power, step_size=step_size)
     
-    def get_rolling_band_power_welch(self, freq_range=(0.5, 4), ref_power=0.001, window_sec=2, step_size=1) -> Self:
+    def get_rolling_band_power_welch(self, freq_range=(0.5, 4), ref_power=0.001, window_sec=2, step_size=1,
+                                     decimate=False, checkpoint: 'Checkpoint' = None) -> Self:
         """
         Gets rolling band power for specified frequency range, data frequency and window size
         freq_range: range of frequencies in form of (lower, upper) to calculate power of
         ref_power: arbitrary reference power to divide the windowed delta power by (used for scaling)
         window_sec: window size in seconds to calculate delta power (if the window is longer than the step size there will be overlap)
         step_size: step size in seconds to calculate delta power in windows (if 1, function returns an array with 1Hz power calculations)
+        decimate: compute on a copy downsampled to the band of interest, see band_limit.
+            Faster; against the full-rate estimate the median window differs by
+            about 1% but single short windows by up to ~15% (measured by
+            benchmarks/verify_fast_paths.py), so only for trends over many windows
+        checkpoint: save progress to resume an interrupted run, see _apply_rolling
         """
+        from scipy.integrate import simpson
+        from scipy.signal import welch
+        from scipy.signal.windows import hann
+
+        if decimate:
+            source = self.band_limit(freq_range, window_sec=window_sec, step_size=step_size)
+            if source is not self:
+                rolling_band_power = source.get_rolling_band_power_welch(
+                    freq_range, ref_power, window_sec, step_size, decimate=False, checkpoint=checkpoint)
+                return self._return(rolling_band_power.signal, step_size=step_size)
+
         def get_band_power_welch(a, start, end):
             lower_freq = freq_range[0]
             upper_freq = freq_range[1]
@@ -288,32 +531,84 @@ class Channel:
         rolling_band_power = self._apply_rolling(
             window_sec=window_sec,
             step_size=step_size,
-            process=get_band_power_welch
+            process=get_band_power_welch,
+            checkpoint=checkpoint
         )
         return self._return(rolling_band_power, step_size=step_size)
     
 
-    def get_heart_rate(self, search_radius=200):
+    def get_heart_beats(self, search_radius=200) -> 'EventSeries':
         """
-        Gets heart rate at 1 Hz and extrapolates it to the same frequency as input data
+        Detects R-peaks and returns the beat-to-beat intervals as an EventSeries,
+        each valued at its heart rate in beats per minute
         search_radius: search radius to look for peaks (200 ~= 150 bpm upper bound)
         """
-        rpeaks = detect_heartbeats(self.signal, self.freq)  # using sleepecg
-        rpeaks_corrected = wfdb.processing.correct_peaks(
-            self.signal, rpeaks, search_radius=search_radius, smooth_window_size=50, peak_dir="up"
+        import wfdb.processing
+        from sleepecg import detect_heartbeats
+        from utils.EventSeries import EventSeries
+
+        # beats are detected separately on each run of samples without NaN
+        # (gaps between EDF segments): the detector finds nothing at all in
+        # a signal holding NaN, and no interval may span a gap
+        present = ~np.isnan(self.signal)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], present.astype(np.int8), [0]))))
+        starts, ends = [], []
+        for run_start, run_end in zip(edges[::2], edges[1::2]):
+            run = self.signal[run_start:run_end]
+            if len(run) < 2 * self.freq:
+                continue
+            rpeaks = detect_heartbeats(run, self.freq)  # using sleepecg
+            rpeaks_corrected = wfdb.processing.correct_peaks(
+                run, rpeaks, search_radius=search_radius, smooth_window_size=50, peak_dir="up"
+            )
+            # MIGHT HAVE TO UPDATE search_radius
+            # correction can move peaks near the edges outside of the signal
+            # and merge neighbours into duplicates
+            rpeaks_corrected = np.unique(rpeaks_corrected[(rpeaks_corrected >= 0) & (rpeaks_corrected < len(run))])
+            starts.append(run_start + rpeaks_corrected[:-1])
+            ends.append(run_start + rpeaks_corrected[1:])
+        starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+        ends = np.concatenate(ends) if ends else np.empty(0, dtype=np.int64)
+        heart_rates = 60 / ((ends - starts) / self.freq)
+        return EventSeries(
+            start_ts=self.start_ts,
+            name=f'{self.name}.get_heart_beats',
+            times=self.time[starts],
+            values=heart_rates,
+            ends=self.time[ends],
+            time_range=(float(self.time[0]), float(self.time[-1]) + 1/self.freq) if len(self.time) else (0.0, 0.0)
         )
-        # MIGHT HAVE TO UPDATE search_radius
-        heart_rates = [60 / ((rpeaks_corrected[i+1] - rpeaks_corrected[i]) / self.freq) for i in range(len(rpeaks_corrected) - 1)]
-        # Create a heart rate array matching the frequency of the ECG trace
-        hr_data = np.zeros_like(self.signal)
-        # Assign heart rate values to the intervals between R-peaks
-        for i in range(len(rpeaks_corrected) - 1):
-            start_idx = rpeaks_corrected[i]
-            end_idx = rpeaks_corrected[i+1]
-            hr_data[start_idx:end_idx] = heart_rates[i]
-
-        return self._return(hr_data, step_size=1)
-    
+
+    def get_heart_rate(self, search_radius=200):
+        """
+        Gets heart rate at 1 Hz, 0 outside of the detected beats
+        search_radius: search radius to look for peaks (200 ~= 150 bpm upper bound)
+        """
+        beats = self.get_heart_beats(search_radius)
+        # sampled from the beats directly, without a per-sample heart rate array
+        return self._return(beats.sample(self.time[::self.freq]), step_size=1)
+
+    def get_rolling_hrv(self, metric='rmssd', window_sec=300, step_size=1, search_radius=200) -> Self:
+        """
+        Gets a heart rate variability metric of the beats in each rolling window
+        metric: 'rmssd', 'sdnn' (both in milliseconds) or 'lf_hf', see EventSeries
+        window_sec: window size in seconds, LF/HF needs at least two minutes
+        step_size: step size in seconds
+        search_radius: search radius to look for peaks, see get_heart_beats
+        """
+        from utils.EventSeries import EventSeries
+        if metric not in EventSeries.HRV_METRICS:
+            raise ValueError(f"HRV metric must be one of {EventSeries.HRV_METRICS}, not {metric}")
+
+        beats = self.get_heart_beats(search_radius)
+        starts, ends, valid = self._get_window_bounds(window_sec, step_size)
+        window_starts = np.full(len(starts), np.nan)
+        window_ends = np.full(len(starts), np.nan)
+        window_starts[valid] = self.time[starts[valid]]
+        window_ends[valid] = self.time[ends[valid] - 1] + 1/self.freq
+        rolling_hrv = beats.apply_windows(window_starts, window_ends, lambda b: b.get_hrv(metric))
+        return self._return(rolling_hrv, step_size)
+
     def visualize(self):
         """
         """
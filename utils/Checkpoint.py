@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import zlib
+import numpy as np
+
+
+class Checkpoint:
+    """
+    Partial output of a rolling feature (see Channel._apply_rolling) saved
+    to disk while it is computed, so that a computation interrupted by a
+    crash, a restart or a cancelled job resumes from its last saved window.
+
+    A checkpoint is only resumed if it was written for the same identity:
+    whatever the caller puts in it (EDF files, channel, method and
+    parameters) plus what `bind` derives from the Channel and windows
+    actually being processed.
+    """
+    def __init__(self, path, identity: dict, interval_sec=30) -> None:
+        """
+        path: .npz file to save to, typically in the analysis directory
+        identity: JSON serializable description of the computation
+        interval_sec: minimum time between two saves while computing
+        """
+        self.path = path
+        self.identity = identity
+        self.interval_sec = interval_sec
+        self.last_save = time.monotonic()
+
+    @staticmethod
+    def normalize(identity: dict) -> dict:
+        # compare identities the way they read back from disk
+        return json.loads(json.dumps(identity, sort_keys=True, default=str))
+
+    def bind(self, channel, window_sec, step_size) -> None:
+        """
+        Adds the Channel and window layout to the identity. The signal is
+        fingerprinted from a fixed number of evenly spaced samples, which
+        with the EDF identity given by the caller is enough to tell two
+        inputs apart without hashing a whole multi-day recording.
+        """
+        n = len(channel.signal)
+        sample = np.ascontiguousarray(channel.signal[np.linspace(0, n - 1, min(n, 4096)).astype(np.int64)])
+        quality = None
+        if channel.quality is not None and channel.name in channel.quality.flags:
+            quality = zlib.crc32(channel.quality.flags[channel.name].tobytes())
+        self.identity = {
+            **self.identity,
+            'signal': {
+                'name': channel.name,
+                'freq': channel.freq,
+                'n_samples': n,
+                'start': float(channel.time[0]) if n else None,
+                'crc': zlib.crc32(sample.tobytes()),
+                'quality_crc': quality,
+            },
+            'window_sec': window_sec,
+            'step_size': step_size,
+        }
+
+    def load(self) -> tuple | None:
+        """
+        Returns (values, done) saved for this identity: the output so far and
+        the number of windows completed, or None if there is nothing to resume
+        """
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with np.load(self.path) as saved:
+                if json.loads(str(saved['identity'])) != self.normalize(self.identity):
+                    return None
+                return saved['values'].copy(), int(saved['done'])
+        except (OSError, ValueError, KeyError):
+            # a checkpoint cut short by a crash is just started over
+            return None
+
+    def save(self, values, done) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, values=values, done=done,
+                 identity=np.array(json.dumps(self.normalize(self.identity))))
+        os.replace(tmp_path, self.path)
+        self.last_save = time.monotonic()
+
+    def save_if_due(self, values, done) -> None:
+        if time.monotonic() - self.last_save >= self.interval_sec:
+            self.save(values, done)
+
+    def remove(self) -> None:
+        if os.path.isfile(self.path):
+            os.remove(self.path)
@@ -0,0 +1,147 @@
+import os
+import json
+import glob
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import config as cfg
+from utils.AnalysisStore import AnalysisStore
+from utils.Jobs import report_progress
+
+SUMMARY_STATS = ('mean', 'std', 'p5', 'p25', 'median', 'p75', 'p95')
+
+
+def get_summary_dir(store=cfg.ANALYSIS_STORE) -> str:
+    return f"{store}/{AnalysisStore.CATALOG_DIR}/cohort"
+
+
+def get_label_files(analysis, store=cfg.ANALYSIS_STORE) -> list:
+    return sorted(glob.glob(f"{AnalysisStore.get_analysis_dir(analysis, store)}/*.csv"))
+
+
+def get_fingerprint(analysis, store=cfg.ANALYSIS_STORE) -> list:
+    """
+    Size and modification time of every input of an analysis summary
+    (EDFs, configuration, label CSVs and computed features). The cached
+    summary of an analysis is reused as long as its fingerprint is unchanged.
+    """
+    analysis_dir = AnalysisStore.get_analysis_dir(analysis, store)
+    paths = AnalysisStore.get_edfs_from_analysis(analysis, path=True, store=store)
+    paths.append(f"{analysis_dir}/EDFconfig.json")
+    paths += get_label_files(analysis, store)
+    paths += sorted(glob.glob(f"{analysis_dir}/{cfg.FEATURE_DIR}/*.csv"))
+    fingerprint = []
+    for path in paths:
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            fingerprint.append([os.path.relpath(path, analysis_dir), stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+def describe(values) -> dict:
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return {stat: np.nan for stat in SUMMARY_STATS}
+    p5, p25, median, p75, p95 = np.percentile(values, [5, 25, 50, 75, 95])
+    return {'mean': values.mean(), 'std': values.std(), 'p5': p5, 'p25': p25,
+            'median': median, 'p75': p75, 'p95': p95}
+
+
+def summarize_analysis(analysis, store=cfg.ANALYSIS_STORE, compute_missing=False) -> dict:
+    """
+    Summary features of one analysis as a flat dictionary:
+    distribution statistics of every computed feature (band powers, heart
+    rate...), and the fraction of time spent in each labelled state if the
+    analysis holds a label CSV with a `cfg.LABEL_COLUMN` column.
+    compute_missing: first compute configured features that have no output yet
+    """
+    import pandas as pd
+
+    if compute_missing:
+        from utils.FeatureRunner import FeatureRunner
+        FeatureRunner(analysis, store=store).run()
+
+    summary = {}
+    feature_dir = f"{AnalysisStore.get_analysis_dir(analysis, store)}/{cfg.FEATURE_DIR}"
+    for path in sorted(glob.glob(f"{feature_dir}/*.csv")):
+        feature = os.path.basename(path)[:-len('.csv')]
+        column = pd.read_csv(path).iloc[:, 1]
+        values = column.to_numpy(dtype=np.float64)
+        if column.name.endswith('.get_heart_rate'):
+            # intervals without detected beats are filled with 0 bpm
+            values = values[values > 0]
+        for stat, value in describe(values).items():
+            summary[f"{feature}.{stat}"] = value
+
+    for path in get_label_files(analysis, store):
+        labels = pd.read_csv(path)
+        if cfg.LABEL_COLUMN not in labels:
+            continue
+        for state, fraction in labels[cfg.LABEL_COLUMN].value_counts(normalize=True).items():
+            summary[f"time_in_state.{state}"] = fraction
+    return summary
+
+
+def _summarize(analysis, store, compute_missing) -> tuple:
+    summary = summarize_analysis(analysis, store, compute_missing)
+    # fingerprint after summarizing so features computed on the way are included
+    return analysis, summary, get_fingerprint(analysis, store)
+
+
+def read_cached_summary(analysis, store=cfg.ANALYSIS_STORE) -> dict | None:
+    path = f"{get_summary_dir(store)}/{analysis}.json"
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        cached = json.load(f)
+    # missing statistics are stored as null, see write_cached_summary
+    cached['summary'] = {k: (np.nan if v is None else v) for k, v in cached['summary'].items()}
+    return cached
+
+
+def write_cached_summary(analysis, summary, fingerprint, store=cfg.ANALYSIS_STORE) -> None:
+    os.makedirs(get_summary_dir(store), exist_ok=True)
+    path = f"{get_summary_dir(store)}/{analysis}.json"
+    with open(f"{path}.tmp", 'w') as f:
+        # NaN is not valid JSON, store missing statistics as null
+        json.dump({
+            'fingerprint': fingerprint,
+            'summary': {k: (None if v != v else v) for k, v in summary.items()}
+        }, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def update_cohort(analyses, store=cfg.ANALYSIS_STORE, workers=None, compute_missing=False):
+    """
+    Builds the cohort table (one row per analysis, one column per summary
+    feature). Only analyses whose inputs changed since their summary was
+    cached are recomputed, in parallel across a process pool.
+    Returns a pandas DataFrame indexed by analysis.
+    """
+    import pandas as pd
+
+    summaries = {}
+    stale = []
+    for analysis in analyses:
+        cached = read_cached_summary(analysis, store)
+        if cached is not None and cached['fingerprint'] == get_fingerprint(analysis, store):
+            summaries[analysis] = cached['summary']
+        else:
+            stale.append(analysis)
+
+    if stale:
+        # spawn rather than fork: this is called from threads of the
+        # Streamlit server, which must not be forked mid-flight
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(_summarize, a, store, compute_missing) for a in stale]
+            for done, future in enumerate(as_completed(futures), start=1):
+                analysis, summary, fingerprint = future.result()
+                write_cached_summary(analysis, summary, fingerprint, store)
+                summaries[analysis] = summary
+                report_progress(done / len(stale), f"Summarized {analysis}")
+
+    table = pd.DataFrame.from_dict(summaries, orient='index').reindex(analyses)
+    table.index.name = 'analysis'
+    return table
@@ -0,0 +1,148 @@
+"""
+Single-pass engine for per-window counting features. Each feature is first
+turned into one event vector over the whole signal (sign changes, threshold
+crossings, local maxima...), whose prefix sum then gives the count in any
+window with two lookups, whatever the window and step sizes. Windows follow
+Channel._apply_rolling: centered every `step_size` seconds, NaN where they
+run over the edges of the signal.
+"""
+import numpy as np
+
+
+def get_window_bounds(n, freq, window_sec, step_size) -> tuple:
+    """
+    Returns (starts, ends, valid) sample indices of the rolling windows
+    n: number of samples in the signal
+    freq: sampling frequency of the signal
+    window_sec: window size in seconds
+    step_size: step between window centers in seconds
+    """
+    half = int(window_sec * freq) // 2
+    centers = np.arange(0, n, int(step_size * freq))
+    starts = centers - half
+    ends = centers + half
+    valid = (starts >= 0) & (ends <= n)
+    return np.clip(starts, 0, n), np.clip(ends, 0, n), valid
+
+
+def rolling_sum(values, starts, ends, valid) -> np.array:
+    """
+    Sum of `values[start:end]` for every window, NaN for invalid windows
+    and for windows holding NaN values (e.g. gaps between EDF segments)
+    """
+    missing = np.isnan(values)
+    if missing.any():
+        # a single NaN would otherwise poison every later prefix sum
+        values = np.where(missing, 0, values)
+        valid = valid & (rolling_sum(missing, starts, ends, valid) == 0)
+    prefix = np.concatenate(([0], np.cumsum(values, dtype=np.float64)))
+    ends = np.maximum(ends, starts)
+    result = prefix[ends] - prefix[starts]
+    result[~valid] = np.nan
+    return result
+
+
+def sign_changes(a) -> np.array:
+    """
+    Boolean vector marking where a[i] and a[i+1] have strictly opposite signs
+    """
+    return (a[:-1] * a[1:]) < 0
+
+
+def threshold_crossings(a, threshold, direction='both') -> np.array:
+    """
+    Boolean vector marking where the signal crosses `threshold` between a[i] and a[i+1]
+    direction: 'up', 'down' or 'both'
+    """
+    above = a >= threshold
+    up = ~above[:-1] & above[1:]
+    down = above[:-1] & ~above[1:]
+    match direction:
+        case 'up':
+            return up
+        case 'down':
+            return down
+        case 'both':
+            return up | down
+        case _:
+            raise ValueError(f"direction must be 'up', 'down' or 'both', not {direction}")
+
+
+def local_maxima(a, height=None) -> np.array:
+    """
+    Boolean vector (same length as `a`) marking samples greater than the
+    previous one and at least the next one, optionally only at or above `height`
+    """
+    peaks = np.zeros(len(a), dtype=bool)
+    peaks[1:-1] = (a[1:-1] > a[:-2]) & (a[1:-1] >= a[2:])
+    if height is not None:
+        peaks &= a >= height
+    return peaks
+
+
+def exclude_missing(missing, starts, ends, valid) -> np.array:
+    """
+    Returns `valid` without the windows holding a missing sample
+    missing: boolean vector of the samples without data (NaN) in the signal
+    """
+    if missing is None or not missing.any():
+        return valid
+    return valid & (rolling_sum(missing, starts, ends, valid) == 0)
+
+
+def count_pairs(events, starts, ends, valid, missing=None) -> np.array:
+    """
+    Counts events defined between neighbouring samples (length n-1) whose
+    pair lies entirely inside each window
+    missing: NaN samples of the signal, see exclude_missing. Comparisons
+        with NaN are False, so the events alone would count 0 over a gap
+    """
+    valid = exclude_missing(missing, starts, ends, valid)
+    return rolling_sum(events, starts, np.maximum(ends - 1, starts), valid)
+
+
+def count_peaks(peaks, starts, ends, valid, missing=None) -> np.array:
+    """
+    Counts peaks whose neighbours on both sides lie inside each window
+    missing: NaN samples of the signal, see count_pairs
+    """
+    valid = exclude_missing(missing, starts, ends, valid)
+    return rolling_sum(peaks, np.minimum(starts + 1, ends), np.maximum(ends - 1, starts), valid)
+
+
+def _rolling_var(values, starts, ends, valid) -> np.array:
+    # population variance from prefix sums of the values and their squares,
+    # centered first to limit cancellation
+    present = values[~np.isnan(values)]
+    values = values - present.mean() if len(present) else values
+    count = (ends - starts).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = rolling_sum(values, starts, ends, valid) / count
+        square = rolling_sum(values**2, starts, ends, valid) / count
+        var = square - mean**2
+    # what is left of a constant window (flat line) after the subtraction is
+    # rounding error of the prefix sums, which scales with the power of the
+    # whole signal: zero it so that ratios of variances are NaN as they are
+    # when computed window by window
+    floor = 1e-9 * np.maximum(square, present.var() if len(present) else 0)
+    var[var <= floor] = 0
+    return var
+
+
+def rolling_hjorth(a, starts, ends, valid) -> tuple:
+    """
+    Hjorth parameters of every window, returns (activity, mobility, complexity)
+    activity: variance of the signal
+    mobility: sqrt(var(a') / var(a))
+    complexity: mobility(a') / mobility(a)
+    """
+    a = np.asarray(a, dtype=np.float64)
+    da = np.diff(a)
+    dda = np.diff(da)
+    activity = _rolling_var(a, starts, ends, valid)
+    var_da = _rolling_var(da, starts, np.maximum(ends - 1, starts), valid)
+    var_dda = _rolling_var(dda, starts, np.maximum(ends - 2, starts), valid)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mobility = np.sqrt(var_da / activity)
+        complexity = np.sqrt(var_dda / var_da) / mobility
+    return activity, mobility, complexity
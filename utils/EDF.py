@@ -1,8 +1,15 @@
+import os
 from datetime import timedelta, datetime
-from typing import Self
-import pandas as pd
-import mne
+from typing import Self, TYPE_CHECKING
+import numpy as np
 from utils.Channel import Channel
+from utils.EDFIndex import EDFIndex
+from utils.QualityControl import QualityMask
+from utils.RawCache import RawCache
+# mne and pandas are imported where used to keep page imports light,
+# see the note in utils/Channel.py
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class EDFutils:
@@ -10,12 +17,17 @@ class EDFutils:
         self.filepath = filepath
         self.time_range = (None, None)
 
-        with mne.io.read_raw_edf(filepath, preload=False, **kwargs) as raw:
-            self.channels = raw.ch_names
-            self.start_ts = raw.info['meas_date'].replace(tzinfo=None)
-            self.end_ts = self.start_ts + timedelta(seconds=raw.times[-1])
-
-        self.channel_freqs = {ch: self.get_channel_frequency(ch) for ch in self.channels}
+        # header metadata comes from the sidecar index, which is only
+        # rebuilt when the EDF changed since it was written
+        self.index = EDFIndex.load(filepath)
+        self.channels = self.index.channels
+        self.start_ts = self.index.start_ts
+        self.end_ts = self.index.end_ts
+        self.channel_freqs = self.index.channel_freqs
+        # compressed copy of the samples, read instead of the EDF when present
+        self.cache = RawCache.load(filepath)
+        # quality control mask saved next to the EDF, if it was scanned
+        self.quality = QualityMask.load(os.path.dirname(filepath), [filepath])
 
     def __getitem__(self, item) -> Channel:
         if item not in self.channels:
@@ -24,13 +36,29 @@ class EDFutils:
             freq = self.get_channel_frequency(item)
             
             start_ts = self.start_ts
-            # check for absolute date cutoffs
-            start_idx, end_idx = self.time_range
-            if start_idx and end_idx:
-                start_ts = start_ts + timedelta(seconds=start_idx)
-                start_idx = int(start_idx * freq)
-                end_idx = int(end_idx * freq)
+            # check for absolute date cutoffs, in seconds from the EDF start
+            # (0 is a valid bound, compare against None)
+            start_sec, end_sec = self.time_range
+            start_idx, end_idx = None, None
+            if start_sec is not None:
+                start_idx = max(int(start_sec * freq), 0)
+                start_ts = start_ts + timedelta(seconds=start_idx / freq)
+            if end_sec is not None:
+                end_idx = max(int(end_sec * freq), 0)
+
+            if self.cache is not None:
+                # only the requested range is decompressed
+                start, stop, _ = slice(start_idx, end_idx).indices(self.cache.get_n_samples(item))
+                return Channel(
+                    start_ts=start_ts,
+                    name=item,
+                    signal=self.cache.read(item, start, stop),
+                    time=np.arange(start, stop) / freq,
+                    freq=freq,
+                    quality=self.quality
+                )
 
+            import mne
             with mne.io.read_raw_edf(self.filepath, include=[item], preload=False) as raw:
                 signal, time = raw[0]
 
@@ -39,13 +67,27 @@ class EDFutils:
                 name=item,
                 signal=signal[0],
                 time=time,
-                freq=freq
+                freq=freq,
+                quality=self.quality
             )[start_idx:end_idx]
         
     def get_channel_frequency(self, ch_name):
+        return self.channel_freqs[ch_name]
+
+    def get_n_samples(self, ch_name) -> int:
+        header = self.index.index['header']
+        return header['n_records'] * self.index.index['signals'][ch_name]['samples_per_record']
+
+    def read_signal(self, ch_name, start=0, stop=None) -> np.array:
+        """
+        Reads samples [start, stop) of one channel, only the data records
+        (or cache chunks) covering that range are decoded
+        """
+        if self.cache is not None:
+            return self.cache.read(ch_name, start, stop)
+        import mne
         with mne.io.read_raw_edf(self.filepath, include=[ch_name], preload=False) as raw:
-            freq = len(raw.crop(tmin=0, tmax=1).pick(ch_name).get_data()[0])-1
-        return freq
+            return raw.get_data(start=start, stop=stop)[0]
 
     # TODO
     def resample(self, sfreq, ch_names=None) -> Self:
@@ -69,7 +111,7 @@ class EDFutils:
         self.time_range = (int(front), int(back))
 
     # TODO
-    def to_DataFrame(self, frequency:int, channels:list=None) -> pd.DataFrame:
+    def to_DataFrame(self, frequency:int, channels:list=None) -> 'pd.DataFrame':
         """
         Exports channels to a pandas DataFrame wherein each channel is a column.
         frequency: the desired output frequency to sample all data to
@@ -77,3 +119,105 @@ class EDFutils:
         """
         pass
 
+
+class EDFSet(EDFutils):
+    """
+    Ordered set of consecutive EDF segments (e.g. one deployment logged as
+    several files) presented as one continuous EDFutils timeline that starts
+    at the earliest segment. Channel reads only decode the segments that
+    overlap the requested range; gaps between segments are filled with NaN
+    and where segments overlap the later one wins.
+    """
+    def __init__(self, filepaths) -> None:
+        self.segments = sorted((EDFutils(path) for path in filepaths), key=lambda e: e.start_ts)
+        self.filepath = self.segments[0].filepath
+        self.filepaths = [segment.filepath for segment in self.segments]
+        self.time_range = (None, None)
+
+        first = self.segments[0]
+        self.channels = [ch for ch in first.channels
+                         if all(ch in segment.channels for segment in self.segments)]
+        for segment in self.segments[1:]:
+            for ch in self.channels:
+                if segment.channel_freqs[ch] != first.channel_freqs[ch]:
+                    raise ValueError(f"Channel `{ch}` is sampled at {segment.channel_freqs[ch]} Hz in "
+                                     f"'{segment.filepath}' but {first.channel_freqs[ch]} Hz in '{first.filepath}'")
+        self.channel_freqs = {ch: first.channel_freqs[ch] for ch in self.channels}
+        self.start_ts = first.start_ts
+        self.end_ts = max(segment.end_ts for segment in self.segments)
+        self.offsets = [(segment.start_ts - self.start_ts).total_seconds() for segment in self.segments]
+        self.quality = QualityMask.load(os.path.dirname(self.filepath), self.filepaths)
+
+    def get_n_samples(self, ch_name) -> int:
+        freq = self.get_channel_frequency(ch_name)
+        return max(round(offset * freq) + segment.get_n_samples(ch_name)
+                   for offset, segment in zip(self.offsets, self.segments))
+
+    def read_signal(self, ch_name, start=0, stop=None) -> np.array:
+        """
+        Reads samples [start, stop) of one channel on the virtual timeline
+        """
+        freq = self.get_channel_frequency(ch_name)
+        stop = self.get_n_samples(ch_name) if stop is None else stop
+        signal = np.full(max(stop - start, 0), np.nan)
+        for offset, segment in zip(self.offsets, self.segments):
+            segment_start = round(offset * freq)
+            lo = max(start, segment_start)
+            hi = min(stop, segment_start + segment.get_n_samples(ch_name))
+            if lo < hi:
+                signal[lo - start:hi - start] = segment.read_signal(
+                    ch_name, lo - segment_start, hi - segment_start)
+        return signal
+
+    def _read_channel(self, item, start_sec=None, end_sec=None) -> Channel:
+        if item not in self.channels:
+            raise KeyError(f"`{item}` not a channel in all of the EDF files {self.filepaths}")
+        freq = self.get_channel_frequency(item)
+        n_samples = self.get_n_samples(item)
+        start_idx = 0 if start_sec is None else min(max(int(start_sec * freq), 0), n_samples)
+        end_idx = n_samples if end_sec is None else min(max(int(end_sec * freq), start_idx), n_samples)
+        return Channel(
+            start_ts=self.start_ts + timedelta(seconds=start_idx / freq),
+            name=item,
+            signal=self.read_signal(item, start_idx, end_idx),
+            time=np.arange(start_idx, end_idx) / freq,
+            freq=freq,
+            quality=self.quality
+        )
+
+    def __getitem__(self, item) -> Channel:
+        return self._read_channel(item, *self.time_range)
+
+    def date_slice(self, item, start_date, end_date) -> Channel:
+        """
+        Reads one channel between two dates, decoding only the segments involved
+        start_date: start date in the form of a string or datetime object
+        end_date: end date in the form of a string or datetime object
+        """
+        import pandas as pd
+        start = (pd.to_datetime(start_date).to_pydatetime() - self.start_ts).total_seconds()
+        end = (pd.to_datetime(end_date).to_pydatetime() - self.start_ts).total_seconds()
+        return self._read_channel(item, start, end)
+
+    def get_details(self) -> dict:
+        """
+        Same summary as EDFIndex.get_details, over the whole set
+        """
+        return {
+            'start_ts': self.start_ts,
+            'end_ts': self.end_ts,
+            'freqs': self.channel_freqs,
+            'channels': self.channels,
+        }
+
+
+def open_edf(filepaths) -> EDFutils:
+    """
+    Opens the EDF file(s) of an analysis: a single path or a one-element list
+    gives an EDFutils, several paths an EDFSet
+    """
+    if isinstance(filepaths, str):
+        return EDFutils(filepaths)
+    if len(filepaths) == 1:
+        return EDFutils(filepaths[0])
+    return EDFSet(filepaths)
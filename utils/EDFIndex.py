@@ -0,0 +1,216 @@
+import os
+import json
+from datetime import datetime, timedelta
+
+
+class EDFIndex:
+    """
+    Sidecar index of an EDF file's header, written next to the EDF as
+    `<file>.edf.index.json`. Holds everything needed to describe the recording
+    (header fields, per-channel sample rates, gain/offset, record layout and
+    time extent) so it can be opened without decoding the EDF again.
+    The index is tied to the EDF by size and modification time and is rebuilt
+    whenever those no longer match.
+    """
+    SUFFIX = '.index.json'
+    VERSION = 1
+    ANNOTATION_LABEL = 'EDF Annotations'
+
+    def __init__(self, edf_path, index: dict) -> None:
+        self.edf_path = edf_path
+        self.index = index
+
+    @staticmethod
+    def get_sidecar_path(edf_path) -> str:
+        return f"{edf_path}{EDFIndex.SUFFIX}"
+
+    @staticmethod
+    def get_file_identity(edf_path) -> dict:
+        stat = os.stat(edf_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    @staticmethod
+    def parse_start(date: str, time: str) -> datetime:
+        """
+        Parses the EDF `dd.mm.yy` / `hh.mm.ss` start fields, using the
+        EDF spec's 1985 clipping year for two-digit years.
+        """
+        day, month, year = (int(x) for x in date.split('.'))
+        hour, minute, second = (int(x) for x in time.split('.'))
+        year += 1900 if year >= 85 else 2000
+        return datetime(year, month, day, hour, minute, second)
+
+    @classmethod
+    def build(cls, edf_path) -> 'EDFIndex':
+        """
+        Parses the header of the EDF at `edf_path`. Only the header bytes are
+        read, the data records are never touched.
+        """
+        with open(edf_path, 'rb') as f:
+            fixed = f.read(256).decode('ascii', errors='replace')
+            n_signals = int(fixed[252:256])
+            signal_header = f.read(256 * n_signals).decode('ascii', errors='replace')
+
+        def fields(width, offset):
+            start = offset * n_signals
+            return [signal_header[start + i*width:start + (i+1)*width].strip()
+                    for i in range(n_signals)]
+
+        # per-signal fields are stored column-wise: all labels, then all
+        # transducers, etc. Offsets below count preceding fields in units of n_signals
+        labels = fields(16, 0)
+        transducers = fields(80, 16)
+        dimensions = fields(8, 96)
+        physical_min = [float(x) for x in fields(8, 104)]
+        physical_max = [float(x) for x in fields(8, 112)]
+        digital_min = [int(float(x)) for x in fields(8, 120)]
+        digital_max = [int(float(x)) for x in fields(8, 128)]
+        prefiltering = fields(80, 136)
+        samples_per_record = [int(x) for x in fields(8, 216)]
+
+        header_bytes = int(fixed[184:192])
+        record_duration = float(fixed[244:252])
+        record_bytes = 2 * sum(samples_per_record)
+        n_records = int(fixed[236:244])
+        identity = cls.get_file_identity(edf_path)
+        if n_records < 0:
+            # -1 is allowed while recording, derive it from the file size
+            n_records = (identity['size'] - header_bytes) // record_bytes
+
+        start_ts = cls.parse_start(fixed[168:176], fixed[176:184])
+        signals = {}
+        byte_offset = 0
+        for i, label in enumerate(labels):
+            gain = (physical_max[i] - physical_min[i]) / (digital_max[i] - digital_min[i])
+            freq = samples_per_record[i] / record_duration
+            signals[label] = {
+                'transducer': transducers[i],
+                'physical_dimension': dimensions[i],
+                'physical_min': physical_min[i],
+                'physical_max': physical_max[i],
+                'digital_min': digital_min[i],
+                'digital_max': digital_max[i],
+                'prefiltering': prefiltering[i],
+                'samples_per_record': samples_per_record[i],
+                'freq': int(freq) if freq.is_integer() else freq,
+                'gain': gain,
+                'offset': physical_min[i] - gain * digital_min[i],
+                'record_offset': byte_offset,
+            }
+            byte_offset += 2 * samples_per_record[i]
+
+        channels = [label for label in labels if label != cls.ANNOTATION_LABEL]
+        max_freq = max(signals[ch]['freq'] for ch in channels)
+        # matches the last sample time mne reports for the recording
+        duration = n_records * record_duration - 1 / max_freq
+
+        index = {
+            'version': cls.VERSION,
+            'file': identity,
+            'header': {
+                'version': fixed[0:8].strip(),
+                'patient': fixed[8:88].strip(),
+                'recording': fixed[88:168].strip(),
+                'reserved': fixed[192:236].strip(),
+                'header_bytes': header_bytes,
+                'n_records': n_records,
+                'record_duration': record_duration,
+                'record_bytes': record_bytes,
+                'n_signals': n_signals,
+            },
+            'start_ts': start_ts.isoformat(),
+            'end_ts': (start_ts + timedelta(seconds=duration)).isoformat(),
+            'channels': channels,
+            'signals': signals,
+        }
+        return cls(edf_path, index)
+
+    @classmethod
+    def load(cls, edf_path, rebuild=True) -> 'EDFIndex | None':
+        """
+        Returns the index of the EDF from its sidecar if it is still valid.
+        Otherwise rebuilds and rewrites it, or returns None if `rebuild` is False.
+        """
+        sidecar = cls.get_sidecar_path(edf_path)
+        if os.path.isfile(sidecar):
+            with open(sidecar) as f:
+                index = json.load(f)
+            if (index.get('version') == cls.VERSION
+                    and index.get('file') == cls.get_file_identity(edf_path)):
+                return cls(edf_path, index)
+        if not rebuild:
+            return None
+        edf_index = cls.build(edf_path)
+        edf_index.write()
+        return edf_index
+
+    def write(self) -> None:
+        sidecar = self.get_sidecar_path(self.edf_path)
+        tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, sidecar)
+
+    @staticmethod
+    def get_unit_scale(physical_dimension) -> float:
+        """
+        Factor converting a physical dimension to SI units the way mne does
+        when reading EDFs: microvolts and millivolts become volts, anything
+        else is left as is
+        """
+        prefix = physical_dimension[:-1]
+        if physical_dimension.endswith('V') and prefix in ('u', '\u00b5', '\u03bc'):
+            return 1e-6
+        if physical_dimension.endswith('V') and prefix and set(prefix) == {'\ufffd'}:
+            # a non-ASCII micro sign, replaced when the header was decoded
+            return 1e-6
+        if physical_dimension == 'mV':
+            return 1e-3
+        return 1.0
+
+    def get_n_records(self) -> int:
+        """
+        Number of data records actually present in the file, which can be
+        fewer than the header announces if the recording was cut short
+        """
+        header = self.index['header']
+        available = (self.index['file']['size'] - header['header_bytes']) // header['record_bytes']
+        return min(header['n_records'], available)
+
+    @property
+    def channels(self) -> list:
+        return self.index['channels']
+
+    @property
+    def start_ts(self) -> datetime:
+        return datetime.fromisoformat(self.index['start_ts'])
+
+    @property
+    def end_ts(self) -> datetime:
+        return datetime.fromisoformat(self.index['end_ts'])
+
+    @property
+    def channel_freqs(self) -> dict:
+        return {ch: self.index['signals'][ch]['freq'] for ch in self.channels}
+
+    def get_record_offset(self, record: int, channel=None) -> int:
+        """
+        Byte offset of a data record in the EDF file, or of a channel's
+        samples within that record if `channel` is given.
+        """
+        header = self.index['header']
+        offset = header['header_bytes'] + record * header['record_bytes']
+        if channel is not None:
+            offset += self.index['signals'][channel]['record_offset']
+        return offset
+
+    def get_details(self) -> dict:
+        """
+        Summary used by the configuration page, see ConfigureEDF.load_edf_details
+        """
+        return {
+            'start_ts': self.start_ts,
+            'end_ts': self.end_ts,
+            'freqs': self.channel_freqs,
+            'channels': self.channels,
+        }
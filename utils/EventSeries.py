@@ -0,0 +1,200 @@
+import numpy as np
+from datetime import timedelta
+from typing import Self
+from utils.Channel import Channel
+from utils.Jobs import report_progress
+
+
+class EventSeries:
+    """
+    Sparse series of events on the timeline of a Channel (heart beats,
+    breaths, dives): one entry per event instead of one value per sample.
+    Each event has an onset and an end in seconds, on the same axis as
+    Channel.time, and a value, e.g. the heart rate of a beat-to-beat interval.
+    Events are sorted by onset and must not overlap.
+    """
+    HRV_METRICS = ('rmssd', 'sdnn', 'lf_hf')
+    LF_BAND = (0.04, 0.15)
+    HF_BAND = (0.15, 0.4)
+    # shortest span of beats LF/HF is estimated over: below about two minutes
+    # the LF band only gets a handful of Welch frequency bins
+    LF_HF_MIN_SEC = 120
+
+    def __init__(self, start_ts, name: str, times: np.array, values: np.array = None, ends: np.array = None,
+                 time_range: tuple = None) -> None:
+        """
+        start_ts: datetime of time 0, as Channel.start_ts
+        name: name of the series
+        times: onset of each event in seconds
+        values: value of each event (default 1)
+        ends: end of each event in seconds (default: the value holds until
+            the next onset, and the last one until the end of time_range)
+        time_range: (start, end) in seconds of the recording the events come from
+        """
+        self.start_ts = start_ts
+        self.name = name
+        self.times = np.asarray(times, dtype=np.float64)
+        self.values = np.ones(len(self.times)) if values is None else np.asarray(values, dtype=np.float64)
+        if time_range is None:
+            last = ends[-1] if ends is not None and len(ends) else (self.times[-1] if len(self.times) else 0.0)
+            time_range = (float(self.times[0]) if len(self.times) else 0.0, float(last))
+        self.time_range = time_range
+        if ends is None:
+            ends = np.append(self.times[1:], max(time_range[1], self.times[-1])) if len(self.times) else []
+        self.ends = np.asarray(ends, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __getitem__(self, slice) -> Self:
+        """
+        Returns a new EventSeries instance with the events indexed according
+        to the supplied slice
+        """
+        return EventSeries(
+            start_ts=self.start_ts,
+            name=self.name,
+            times=self.times[slice],
+            values=self.values[slice],
+            ends=self.ends[slice],
+            time_range=self.time_range
+        )
+
+    def time_slice(self, start_time, end_time) -> Self:
+        """
+        Events starting in [start_time, end_time), in seconds, as a new EventSeries instance
+        """
+        start_idx = np.searchsorted(self.times, start_time)
+        end_idx = np.searchsorted(self.times, end_time)
+        sliced = self[start_idx:end_idx]
+        sliced.time_range = (max(start_time, self.time_range[0]), min(end_time, self.time_range[1]))
+        return sliced
+
+    def date_slice(self, start_date, end_date) -> Self:
+        """
+        Slices the events by date, returns a new EventSeries instance
+        start_date: start date in the form of a string or datetime object
+        end_date: end date in the form of a string or datetime object
+        """
+        import pandas as pd
+        recording_start_ts = self.start_ts.timestamp()
+        return self.time_slice(pd.to_datetime(start_date).timestamp() - recording_start_ts,
+                               pd.to_datetime(end_date).timestamp() - recording_start_ts)
+
+    def sample(self, time: np.array, fill=0.0) -> np.array:
+        """
+        Value of the event in progress at each of `time` (onset <= t < end),
+        `fill` where there is none
+        """
+        time = np.asarray(time)
+        idx = np.searchsorted(self.times, time, side='right') - 1
+        sampled = np.full(len(time), fill, dtype=np.float64)
+        if not len(self.times):
+            return sampled
+        inside = idx >= 0
+        inside[inside] = time[inside] < self.ends[idx[inside]]
+        sampled[inside] = self.values[idx[inside]]
+        return sampled
+
+    def resample(self, freq, fill=0.0) -> Channel:
+        """
+        Dense Channel of the event values at `freq` Hz over time_range, see sample
+        """
+        start, end = self.time_range
+        time = start + np.arange(int(np.floor((end - start) * freq))) / freq
+        return Channel(
+            start_ts=self.start_ts,
+            name=self.name,
+            signal=self.sample(time, fill),
+            time=time,
+            freq=freq,
+            end_ts=self.start_ts + timedelta(seconds=end)
+        )
+
+    def to_DataFrame(self) -> 'pd.DataFrame':
+        """
+        Returns 3-column pandas DataFrame of onset, end and value of the events
+        """
+        import pandas as pd
+        return pd.DataFrame({'time': self.times, 'end': self.ends, self.name: self.values})
+
+    def get_intervals(self) -> tuple:
+        """
+        Returns (durations, ends, adjacent) of the events lasting more than
+        zero seconds: their duration and end in seconds, and whether each one
+        starts where the previous one ended, i.e. whether the difference of
+        two consecutive durations is meaningful
+        """
+        durations = self.ends - self.times
+        kept = durations > 0
+        adjacent = self.times[kept][1:] == self.ends[kept][:-1]
+        return durations[kept], self.ends[kept], adjacent
+
+    def get_rmssd(self) -> float:
+        """
+        Root mean square of successive differences of the beat-to-beat
+        intervals in milliseconds, over adjacent intervals only
+        """
+        durations, _, adjacent = self.get_intervals()
+        successive = np.diff(durations * 1000)[adjacent]
+        return float(np.sqrt(np.mean(successive**2))) if len(successive) else np.nan
+
+    def get_sdnn(self) -> float:
+        """
+        Standard deviation of the beat-to-beat intervals in milliseconds
+        """
+        durations, _, _ = self.get_intervals()
+        return float(np.std(durations * 1000, ddof=1)) if len(durations) > 1 else np.nan
+
+    def get_lf_hf(self, resample_freq=4.0) -> float:
+        """
+        Ratio of low (0.04-0.15 Hz) to high (0.15-0.4 Hz) frequency power of
+        the beat-to-beat intervals. The intervals, placed at the end of each
+        beat, are interpolated to `resample_freq` Hz and Welch's method is
+        applied to the demeaned series. NaN over less than LF_HF_MIN_SEC of beats.
+        resample_freq: rate of the interpolated interval series in Hz
+        """
+        from scipy.signal import welch
+
+        durations, ends, _ = self.get_intervals()
+        if len(durations) < 4:
+            return np.nan
+        if ends[-1] - ends[0] < self.LF_HF_MIN_SEC:
+            return np.nan
+        grid = np.arange(ends[0], ends[-1], 1 / resample_freq)
+        tachogram = np.interp(grid, ends, durations)
+        freqs, psd = welch(tachogram - tachogram.mean(), fs=resample_freq, nperseg=min(len(grid), 256))
+        lf = psd[(freqs >= self.LF_BAND[0]) & (freqs < self.LF_BAND[1])].sum()
+        hf = psd[(freqs >= self.HF_BAND[0]) & (freqs < self.HF_BAND[1])].sum()
+        return float(lf / hf) if hf > 0 else np.nan
+
+    def apply_windows(self, window_starts: np.array, window_ends: np.array, process) -> np.array:
+        """
+        Applies `process` to the events entirely within each window
+        [window_starts, window_ends) in seconds, NaN for windows with NaN bounds
+        process: function of an EventSeries returning a float
+        """
+        accum = np.full(len(window_starts), np.nan)
+        valid = np.flatnonzero(~np.isnan(window_starts) & ~np.isnan(window_ends))
+        # non-overlapping events have sorted ends as well as sorted onsets
+        first = np.searchsorted(self.times, window_starts[valid])
+        last = np.searchsorted(self.ends, window_ends[valid], side='right')
+        for count, (n, lo, hi) in enumerate(zip(valid, first, last)):
+            if count % 256 == 0:
+                report_progress(n / len(window_starts))
+            accum[n] = process(self[lo:max(lo, hi)])
+        return accum
+
+    def get_hrv(self, metric) -> float:
+        """
+        metric: one of EventSeries.HRV_METRICS
+        """
+        match metric:
+            case 'rmssd':
+                return self.get_rmssd()
+            case 'sdnn':
+                return self.get_sdnn()
+            case 'lf_hf':
+                return self.get_lf_hf()
+            case _:
+                raise ValueError(f"HRV metric must be one of {self.HRV_METRICS}, not {metric}")
@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import time
+import inspect
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import config as cfg
+from utils.AnalysisStore import AnalysisStore
+from utils.Channel import Channel
+from utils.Checkpoint import Checkpoint
+from utils.EDF import EDFutils, open_edf
+from utils.EDFIndex import EDFIndex
+from utils.QualityControl import QualityMask
+
+
+class FeatureRunner:
+    """
+    Computes the configured features of a single analysis directory (the EDF
+    plus the EDFconfig.json written by `SessionBase.write_configuration`)
+    and writes each one to `<analysis>/<cfg.FEATURE_DIR>` as a CSV.
+    Each output is written with an identity sidecar (`<channel>.<feature>.json`,
+    see get_identity) and features whose output exists for the same identity
+    are skipped, so an interrupted run picks up where it left off while
+    outputs of replaced EDFs or changed settings are computed again. Rolling
+    features that support it also save
+    their partial results to `<analysis>/<cfg.CHECKPOINT_DIR>` while computing
+    and resume from them (see utils.Checkpoint).
+    """
+    CONFIG_NAME = 'EDFconfig.json'
+
+    def __init__(self, analysis, store=cfg.ANALYSIS_STORE, features=None, overwrite=False) -> None:
+        self.analysis = analysis
+        self.store = store
+        self.analysis_dir = AnalysisStore.get_analysis_dir(analysis, store)
+        self.output_dir = f"{self.analysis_dir}/{cfg.FEATURE_DIR}"
+        self.checkpoint_dir = f"{self.analysis_dir}/{cfg.CHECKPOINT_DIR}"
+        self.overwrite = overwrite
+
+        self.edfpaths = AnalysisStore.get_edfs_from_analysis(analysis, path=True, store=store)
+        if not self.edfpaths:
+            raise FileNotFoundError(f"No EDF file found in analysis '{analysis}'")
+        self.config = AnalysisStore.read_configuration(analysis, self.CONFIG_NAME, store)
+        if self.config is None:
+            raise FileNotFoundError(f"No {self.CONFIG_NAME} found in analysis '{analysis}'")
+
+        if features is None:
+            features = self.config.get('features', cfg.DEFAULT_FEATURES)
+        self.features = features
+
+    @staticmethod
+    def get_output_path(output_dir, channel, feature_name, extension='csv') -> str:
+        safe_channel = re.sub(r'[^\w\-.]+', '_', channel)
+        return f"{output_dir}/{safe_channel}.{feature_name}.{extension}"
+
+    def get_identity(self, channel_name, feature: dict) -> dict:
+        """
+        Everything an output depends on: the EDF files, the quality control
+        mask, the time range and the feature parameters
+        """
+        mask_path = QualityMask.get_path(self.analysis_dir)
+        return Checkpoint.normalize({
+            'sources': QualityMask.get_sources(self.edfpaths),
+            'quality': EDFIndex.get_file_identity(mask_path) if os.path.isfile(mask_path) else None,
+            'time': self.config.get('time', {}),
+            'channel': channel_name,
+            'method': feature['method'],
+            'kwargs': feature.get('kwargs', {}),
+        })
+
+    def is_current(self, channel_name, feature: dict) -> bool:
+        """
+        Whether the output of a feature exists and was computed for its current identity
+        """
+        path = self.get_output_path(self.output_dir, channel_name, feature['name'])
+        identity_path = self.get_output_path(self.output_dir, channel_name, feature['name'], 'json')
+        if not os.path.isfile(path) or not os.path.isfile(identity_path):
+            return False
+        try:
+            with open(identity_path) as f:
+                return json.load(f) == self.get_identity(channel_name, feature)
+        except ValueError:
+            return False
+
+    def get_checkpoint(self, channel_name, feature: dict) -> Checkpoint:
+        """
+        Checkpoint of one feature of one channel, only resumed for the same identity
+        """
+        path = self.get_output_path(self.checkpoint_dir, channel_name, feature['name'], 'npz')
+        return Checkpoint(path, self.get_identity(channel_name, feature))
+
+    def get_tasks(self) -> list:
+        """
+        Expands the feature specs over the channels of each configured group,
+        returns a list of (channel, feature spec, output path) tuples.
+        """
+        channel_map = self.config['channels']['map']
+        tasks = []
+        for feature in self.features:
+            for channel in channel_map.get(feature['group'], []):
+                path = self.get_output_path(self.output_dir, channel, feature['name'])
+                tasks.append((channel, feature, path))
+        return tasks
+
+    def load_edf(self) -> EDFutils:
+        import pandas as pd
+        edf = open_edf(self.edfpaths)
+        time_config = self.config.get('time', {})
+        if time_config.get('start') and time_config.get('end'):
+            edf.set_date_range(
+                pd.to_datetime(time_config['start']).to_pydatetime(),
+                pd.to_datetime(time_config['end']).to_pydatetime()
+            )
+        return edf
+
+    def scan_quality(self, rescan=False) -> QualityMask:
+        """
+        Runs the quality control scan of the analysis unless it already has
+        a mask for its current EDFs, returns the mask
+        rescan: scan again even if the mask is current
+        """
+        mask = None if rescan else QualityMask.load(self.analysis_dir, self.edfpaths)
+        if mask is None:
+            mask = QualityMask.scan(self.edfpaths)
+            mask.write(self.analysis_dir)
+        return mask
+
+    @staticmethod
+    def compute_feature(channel: Channel, feature: dict, checkpoint: Checkpoint = None) -> Channel:
+        method = getattr(channel, feature['method'])
+        kwargs = dict(feature.get('kwargs', {}))
+        if checkpoint is not None and 'checkpoint' in inspect.signature(method).parameters:
+            kwargs['checkpoint'] = checkpoint
+        return method(**kwargs)
+
+    @staticmethod
+    def write_feature(result: Channel, path, identity: dict = None) -> None:
+        # write to a temporary file first so a killed run never leaves
+        # a partial output behind that would be mistaken for a finished one
+        tmp_path = f"{path}.tmp"
+        result.to_DataFrame().to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        if identity is not None:
+            # written last: an output without a matching sidecar is recomputed
+            identity_path = f"{os.path.splitext(path)[0]}.json"
+            with open(f"{identity_path}.tmp", 'w') as f:
+                json.dump(identity, f)
+            os.replace(f"{identity_path}.tmp", identity_path)
+
+    def run_feature(self, channel_name, feature: dict) -> str:
+        """
+        Computes and writes a single feature of one channel, returns the output path
+        """
+        path = self.get_output_path(self.output_dir, channel_name, feature['name'])
+        os.makedirs(self.output_dir, exist_ok=True)
+        channel = self.load_edf()[channel_name]
+        checkpoint = self.get_checkpoint(channel_name, feature)
+        self.write_feature(self.compute_feature(channel, feature, checkpoint), path, self.get_identity(channel_name, feature))
+        checkpoint.remove()
+        return path
+
+    def run(self) -> dict:
+        """
+        Computes all pending features, returns a summary dictionary of
+        counts and timings for this analysis.
+        """
+        summary = {
+            'analysis': self.analysis,
+            'computed': 0,
+            'skipped': 0,
+            'failed': 0,
+            'samples': 0,
+            'seconds': 0.0,
+            'errors': []
+        }
+        start = time.perf_counter()
+        tasks = self.get_tasks()
+        pending = [t for t in tasks if self.overwrite or not self.is_current(t[0], t[1])]
+        summary['skipped'] = len(tasks) - len(pending)
+
+        if pending:
+            os.makedirs(self.output_dir, exist_ok=True)
+            edf = self.load_edf()
+            loaded = {}
+            for channel_name, feature, path in pending:
+                try:
+                    if channel_name not in loaded:
+                        loaded[channel_name] = edf[channel_name]
+                        # each channel is read once however many features use it
+                        summary['samples'] += len(loaded[channel_name].signal)
+                    channel = loaded[channel_name]
+                    checkpoint = self.get_checkpoint(channel_name, feature)
+                    result = self.compute_feature(channel, feature, checkpoint)
+                    self.write_feature(result, path, self.get_identity(channel_name, feature))
+                    checkpoint.remove()
+                    summary['computed'] += 1
+                except Exception:
+                    summary['failed'] += 1
+                    summary['errors'].append(
+                        f"{channel_name}.{feature['name']}: {traceback.format_exc(limit=1)}")
+
+        summary['seconds'] = time.perf_counter() - start
+        return summary
+
+
+def _run_one(analysis, store, overwrite, qc=False) -> dict:
+    try:
+        runner = FeatureRunner(analysis, store=store, overwrite=overwrite)
+        if qc:
+            runner.scan_quality()
+        return runner.run()
+    except Exception as e:
+        return {'analysis': analysis, 'computed': 0, 'skipped': 0, 'failed': 1,
+                'samples': 0, 'seconds': 0.0, 'errors': [str(e)]}
+
+
+def run_batch(analyses, store=cfg.ANALYSIS_STORE, workers=None, overwrite=False, on_complete=None,
+              qc=False) -> dict:
+    """
+    Runs FeatureRunner over many analyses concurrently in a process pool.
+    analyses: list of analysis names in `store`
+    workers: number of worker processes (defaults to the CPU count)
+    qc: run the quality control scan of analyses without a current mask first
+    on_complete: optional callback receiving each analysis summary as it finishes
+    Returns a dictionary with per-analysis summaries and batch throughput.
+    """
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_one, a, store, overwrite, qc) for a in analyses]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_complete is not None:
+                on_complete(result)
+
+    wall = time.perf_counter() - start
+    computed = sum(r['computed'] for r in results)
+    samples = sum(r['samples'] for r in results)
+    return {
+        'analyses': sorted(results, key=lambda r: r['analysis']),
+        'wall_seconds': wall,
+        'cpu_seconds': sum(r['seconds'] for r in results),
+        'computed': computed,
+        'skipped': sum(r['skipped'] for r in results),
+        'failed': sum(r['failed'] for r in results),
+        'features_per_sec': computed / wall if wall else 0.0,
+        'samples_per_sec': samples / wall if wall else 0.0,
+    }
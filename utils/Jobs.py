@@ -0,0 +1,132 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# the job being executed by the current worker thread, read by report_progress
+_current = threading.local()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    Handle on a computation submitted to a JobManager. Progress, status and
+    the result are updated from the worker thread and can be polled freely.
+    """
+    def __init__(self, key, description=None) -> None:
+        self.key = key
+        self.description = description or str(key)
+        self.status = 'pending'
+        self.progress = 0.0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('pending', 'running')
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def cancel(self) -> None:
+        """
+        Requests cancellation. Pending jobs never start; running jobs stop at
+        their next report_progress call.
+        """
+        self._cancel.set()
+        if self.status == 'pending':
+            self.status = 'cancelled'
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+
+def report_progress(fraction, message=None) -> None:
+    """
+    Called from inside long computations to report how far along they are.
+    Raises JobCancelled if the job running on this thread was cancelled.
+    Outside of a job this does nothing, so library code can call it freely.
+    """
+    job = getattr(_current, 'job', None)
+    if job is None:
+        return
+    if job.cancelled:
+        raise JobCancelled(job.key)
+    job.progress = min(max(float(fraction), 0.0), 1.0)
+    if message is not None:
+        job.message = message
+
+
+class JobManager:
+    """
+    Runs computations in a thread pool outside of the Streamlit script run.
+    Jobs are keyed (e.g. by analysis and feature spec) so that submitting an
+    identical job while one is pending, running or finished returns the
+    existing Job instead of starting the work again.
+    """
+    def __init__(self, max_workers=None) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, key, fn, *args, description=None, **kwargs) -> Job:
+        """
+        Submits fn(*args, **kwargs) under `key`, returns its Job.
+        Failed and cancelled jobs are replaced by a fresh submission.
+        """
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and job.status not in ('failed', 'cancelled'):
+                return job
+            job = Job(key, description)
+            self.jobs[key] = job
+        self.executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(job: Job, fn, args, kwargs) -> None:
+        if job.cancelled:
+            return
+        job.status = 'running'
+        job.started = time.time()
+        _current.job = job
+        try:
+            job.result = fn(*args, **kwargs)
+            job.progress = 1.0
+            job.status = 'done'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = e
+            job.status = 'failed'
+        finally:
+            _current.job = None
+            job.finished = time.time()
+
+    def get(self, key) -> Job | None:
+        return self.jobs.get(key)
+
+    def cancel(self, key) -> None:
+        job = self.jobs.get(key)
+        if job is not None:
+            job.cancel()
+
+    def forget(self, key) -> None:
+        """
+        Drops a finished job so the same key can be computed again
+        """
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and not job.active:
+                del self.jobs[key]
@@ -0,0 +1,260 @@
+import os
+import json
+from datetime import datetime
+import numpy as np
+from utils.EDFIndex import EDFIndex
+from utils.Jobs import report_progress
+
+
+class QualityMask:
+    """
+    Per-epoch quality of every channel of an analysis, computed by one pass
+    over the raw EDF data records (see scan) and saved as
+    `<analysis>/quality.npz`. Epochs are counted on the timeline of the
+    analysis, in seconds from the start of its earliest EDF, which is the
+    `time` axis of the Channels read from it.
+
+    Each epoch gets a bit field of the problems found in it:
+    FLAT: most consecutive samples are identical (flat-line, disconnected lead)
+    CLIPPED: samples at the digital limits of the recorder (saturation)
+    SPIKE: variance far above the surrounding minute (movement, dive artifacts)
+    DROPOUT: part of the epoch has no data (gaps between EDF segments)
+
+    Rolling features skip the windows overlapping FLAT, CLIPPED or DROPOUT
+    epochs (SKIP_FLAGS). SPIKE is only reported: a transient burst is not
+    always an artifact, and should not hide the data of a whole window.
+
+    The mask is tied to the EDF files by size and modification time and is
+    ignored once they change.
+    """
+    FILE_NAME = 'quality.npz'
+    VERSION = 2
+    FLAT = 1
+    CLIPPED = 2
+    SPIKE = 4
+    DROPOUT = 8
+    FLAGS = {'flat': FLAT, 'clipped': CLIPPED, 'spike': SPIKE, 'dropout': DROPOUT}
+    SKIP_FLAGS = ('flat', 'clipped', 'dropout')
+    METRICS = ('flat', 'clipped', 'std', 'dropout')
+    # flat: fraction of identical consecutive samples
+    # clipped: fraction of samples at the digital min/max
+    # spike: epoch variance over the median epoch variance of the surrounding
+    # SPIKE_REFERENCE_SEC, so that sustained high amplitude (slow-wave sleep)
+    # sets its own reference and only transients shorter than about half of it stand out
+    # dropout: fraction of the epoch without data
+    # (the std metric is kept in the channel's EDF physical dimension)
+    THRESHOLDS = {'flat': 0.9, 'clipped': 0.01, 'spike': 10.0, 'dropout': 0.01}
+    SPIKE_REFERENCE_SEC = 60
+
+    def __init__(self, meta: dict, flags: dict, metrics: dict) -> None:
+        self.meta = meta
+        self.flags = flags
+        self.metrics = metrics
+        self.epoch_sec = meta['epoch_sec']
+        self.start_ts = datetime.fromisoformat(meta['start_ts'])
+        self.channels = meta['channels']
+
+    @staticmethod
+    def get_path(analysis_dir) -> str:
+        return f"{analysis_dir}/{QualityMask.FILE_NAME}"
+
+    @staticmethod
+    def get_sources(edf_paths) -> list:
+        return [dict(file=os.path.basename(path), **EDFIndex.get_file_identity(path))
+                for path in sorted(edf_paths)]
+
+    @staticmethod
+    def get_local_reference(variance, n_epochs) -> np.array:
+        """
+        Centered rolling median of the epoch variances over `n_epochs`
+        epochs, ignoring epochs without data or without any variance
+        """
+        import pandas as pd
+        present = pd.Series(np.where(variance > 0, variance, np.nan))
+        return present.rolling(n_epochs, center=True, min_periods=1).median().to_numpy()
+
+    @classmethod
+    def scan(cls, edf_paths, epoch_sec=1, block_sec=600, thresholds=None) -> 'QualityMask':
+        """
+        Computes the quality metrics of every channel of the EDF file(s) of an
+        analysis. The data records of each file are memory-mapped and read
+        once, in blocks of about `block_sec` seconds holding all channels.
+        edf_paths: EDF path, or the paths of the consecutive segments of an analysis
+        epoch_sec: length of the epochs the metrics are computed over
+        block_sec: seconds of data read at once (bounds memory)
+        thresholds: overrides of QualityMask.THRESHOLDS
+        """
+        edf_paths = [edf_paths] if isinstance(edf_paths, str) else list(edf_paths)
+        thresholds = {**cls.THRESHOLDS, **(thresholds or {})}
+        indexes = sorted((EDFIndex.load(path) for path in edf_paths), key=lambda i: i.start_ts)
+        channels = [ch for ch in indexes[0].channels if all(ch in i.channels for i in indexes)]
+        start_ts = indexes[0].start_ts
+
+        segments = []
+        for index in indexes:
+            segments.append((index, (index.start_ts - start_ts).total_seconds(), index.get_n_records()))
+        duration = max(offset + n_records * index.index['header']['record_duration']
+                       for index, offset, n_records in segments)
+        n_epochs = int(np.ceil(duration / epoch_sec))
+
+        sums = {ch: {k: np.zeros(n_epochs) for k in ('count', 'sum', 'sumsq', 'pairs', 'equal', 'clipped')}
+                for ch in channels}
+        total_records = sum(n_records for _, _, n_records in segments)
+        done_records = 0
+        for index, offset, n_records in segments:
+            header = index.index['header']
+            record_duration = header['record_duration']
+            block_records = max(int(block_sec // record_duration), 1)
+            data = np.memmap(index.edf_path, dtype='<i2', mode='r', offset=header['header_bytes'],
+                             shape=(n_records, header['record_bytes'] // 2))
+            previous = {}
+            for r0 in range(0, n_records, block_records):
+                block = np.asarray(data[r0:r0 + block_records])
+                for ch in channels:
+                    signal = index.index['signals'][ch]
+                    spr = signal['samples_per_record']
+                    first = signal['record_offset'] // 2
+                    x = block[:, first:first + spr].reshape(-1).astype(np.float64)
+                    times = offset + r0 * record_duration + np.arange(len(x)) / signal['freq']
+                    epochs = np.minimum((times // epoch_sec).astype(np.int64), n_epochs - 1)
+                    acc = sums[ch]
+                    acc['count'] += np.bincount(epochs, minlength=n_epochs)
+                    acc['sum'] += np.bincount(epochs, x, minlength=n_epochs)
+                    acc['sumsq'] += np.bincount(epochs, x * x, minlength=n_epochs)
+                    at_limit = (x <= signal['digital_min']) | (x >= signal['digital_max'])
+                    acc['clipped'] += np.bincount(epochs, at_limit, minlength=n_epochs)
+                    # pairs of consecutive samples, carried over block boundaries
+                    # and counted in the epoch of the later sample
+                    pairs = np.concatenate(([previous[ch]], x)) if ch in previous else x
+                    pair_epochs = epochs if ch in previous else epochs[1:]
+                    acc['pairs'] += np.bincount(pair_epochs, minlength=n_epochs)
+                    acc['equal'] += np.bincount(pair_epochs, pairs[1:] == pairs[:-1], minlength=n_epochs)
+                    previous[ch] = x[-1]
+                done_records += len(block)
+                report_progress(done_records / total_records,
+                                f"Scanned {done_records}/{total_records} records of {os.path.basename(index.edf_path)}")
+            del data
+
+        epoch_starts = np.arange(n_epochs) * epoch_sec
+        epoch_lengths = np.minimum(epoch_starts + epoch_sec, duration) - epoch_starts
+        flags, metrics = {}, {}
+        for ch in channels:
+            acc = sums[ch]
+            signal = indexes[0].index['signals'][ch]
+            expected = epoch_lengths * signal['freq']
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = acc['sum'] / acc['count']
+                variance = np.maximum(acc['sumsq'] / acc['count'] - mean**2, 0)
+                metric = {
+                    'flat': acc['equal'] / acc['pairs'],
+                    'clipped': acc['clipped'] / acc['count'],
+                    'std': signal['gain'] * np.sqrt(variance),
+                    'dropout': np.clip(1 - acc['count'] / expected, 0, 1),
+                }
+                reference = cls.get_local_reference(variance, max(int(cls.SPIKE_REFERENCE_SEC // epoch_sec), 1))
+                spike = variance / reference
+            flag = np.zeros(n_epochs, dtype=np.uint8)
+            flag[metric['flat'] >= thresholds['flat']] |= cls.FLAT
+            flag[metric['clipped'] >= thresholds['clipped']] |= cls.CLIPPED
+            flag[spike > thresholds['spike']] |= cls.SPIKE
+            flag[metric['dropout'] >= thresholds['dropout']] |= cls.DROPOUT
+            flags[ch] = flag
+            metrics[ch] = {k: v.astype(np.float32) for k, v in metric.items()}
+
+        meta = {
+            'version': cls.VERSION,
+            'sources': cls.get_sources(edf_paths),
+            'start_ts': start_ts.isoformat(),
+            'epoch_sec': epoch_sec,
+            'thresholds': thresholds,
+            'spike_reference_sec': cls.SPIKE_REFERENCE_SEC,
+            'channels': channels,
+        }
+        return cls(meta, flags, metrics)
+
+    def write(self, analysis_dir) -> str:
+        path = self.get_path(analysis_dir)
+        arrays = {'meta': np.array(json.dumps(self.meta))}
+        for i, ch in enumerate(self.channels):
+            # channel names are not valid archive member names, store by position
+            arrays[f"flags_{i}"] = self.flags[ch]
+            for metric in self.METRICS:
+                arrays[f"{metric}_{i}"] = self.metrics[ch][metric]
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, analysis_dir, edf_paths=None) -> 'QualityMask | None':
+        """
+        Reads the mask of an analysis, or returns None if there is none or,
+        when `edf_paths` is given, if it was computed from other versions of those EDFs
+        """
+        path = cls.get_path(analysis_dir)
+        if not os.path.isfile(path):
+            return None
+        with np.load(path) as archive:
+            meta = json.loads(str(archive['meta']))
+            if meta.get('version') != cls.VERSION:
+                return None
+            if edf_paths is not None:
+                edf_paths = [edf_paths] if isinstance(edf_paths, str) else edf_paths
+                if meta['sources'] != cls.get_sources(edf_paths):
+                    return None
+            flags, metrics = {}, {}
+            for i, ch in enumerate(meta['channels']):
+                flags[ch] = archive[f"flags_{i}"]
+                metrics[ch] = {metric: archive[f"{metric}_{i}"] for metric in cls.METRICS}
+        return cls(meta, flags, metrics)
+
+    def get_flagged(self, channel, flags=None) -> np.array:
+        """
+        Boolean vector of the epochs of `channel` with any of `flags` set
+        flags: names of the flags to consider (default: all)
+        """
+        bits = sum(self.FLAGS[f] for f in (flags or self.FLAGS))
+        return (self.flags[channel] & bits) != 0
+
+    def get_bad_windows(self, channel, time, starts, ends, flags=None) -> np.array:
+        """
+        Boolean vector marking the windows [starts, ends) of a Channel's
+        samples that overlap a flagged epoch, see Channel._get_window_bounds
+        time: Channel.time, seconds on the analysis timeline
+        flags: names of the flags to consider (default: all, features use SKIP_FLAGS)
+        """
+        bad = np.zeros(len(starts), dtype=bool)
+        if channel not in self.flags or not len(time):
+            return bad
+        flagged = self.get_flagged(channel, flags)
+        prefix = np.concatenate(([0], np.cumsum(flagged)))
+        last = len(time) - 1
+        first_epoch = (time[np.clip(starts, 0, last)] // self.epoch_sec).astype(np.int64)
+        last_epoch = (time[np.clip(ends - 1, 0, last)] // self.epoch_sec).astype(np.int64)
+        first_epoch = np.clip(first_epoch, 0, len(flagged))
+        last_epoch = np.clip(last_epoch + 1, first_epoch, len(flagged))
+        bad[:] = prefix[last_epoch] - prefix[first_epoch] > 0
+        return bad
+
+    def get_bad_intervals(self, channel, flags=None) -> list:
+        """
+        Runs of consecutive flagged epochs of a channel as
+        (start_sec, end_sec, flag names) tuples on the analysis timeline
+        """
+        flag = self.flags[channel]
+        flagged = self.get_flagged(channel, flags)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], flagged.astype(np.int8), [0]))))
+        intervals = []
+        for start, end in zip(edges[::2], edges[1::2]):
+            bits = np.bitwise_or.reduce(flag[start:end])
+            names = [name for name, bit in self.FLAGS.items() if bits & bit]
+            intervals.append((float(start * self.epoch_sec), float(end * self.epoch_sec), names))
+        return intervals
+
+    def get_summary(self) -> dict:
+        """
+        Fraction of the epochs of each channel carrying each flag, and any flag
+        """
+        return {ch: {**{name: float(((self.flags[ch] & bit) != 0).mean()) for name, bit in self.FLAGS.items()},
+                     'any': float((self.flags[ch] != 0).mean())}
+                for ch in self.channels}
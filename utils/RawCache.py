@@ -0,0 +1,195 @@
+import os
+import json
+import zlib
+import shutil
+import numpy as np
+from utils.EDFIndex import EDFIndex
+from utils.Jobs import report_progress
+
+
+class RawCache:
+    """
+    Compressed, random-access copy of the samples of an EDF, stored next to
+    it as the `<file>.edf.cache` directory. Each channel keeps its 16-bit
+    digital samples in one file of independently compressed chunks of
+    `chunk_samples` samples (delta encoded, byte shuffled, zlib), listed in
+    `index.json` with the gain/offset needed to restore physical values.
+    Reading a sample range only decompresses the chunks overlapping it.
+
+    Values are scaled exactly like mne.io.read_raw_edf does, so EDFutils can
+    read from the cache in place of the EDF. The cache is tied to the EDF by
+    size and modification time and ignored once they no longer match.
+    """
+    SUFFIX = '.cache'
+    INDEX_NAME = 'index.json'
+    VERSION = 1
+
+    def __init__(self, directory, index: dict) -> None:
+        self.directory = directory
+        self.index = index
+        self.channels = list(index['channels'])
+
+    @staticmethod
+    def get_directory(edf_path) -> str:
+        return f"{edf_path}{RawCache.SUFFIX}"
+
+    @staticmethod
+    def encode(samples: np.array, level) -> bytes:
+        # first differences are small for physiological signals, and putting
+        # all low bytes before all high bytes gives zlib long runs to work on
+        delta = np.diff(samples, prepend=np.int16(0)).astype('<i2')
+        return zlib.compress(delta.view(np.uint8).reshape(-1, 2).T.tobytes(), level)
+
+    @staticmethod
+    def decode(chunk: bytes, out: np.array) -> None:
+        """
+        Decodes one chunk into `out`, an int16 array of its number of samples
+        """
+        shuffled = np.frombuffer(zlib.decompress(chunk), dtype=np.uint8)
+        half = len(shuffled) // 2
+        interleaved = out.view(np.uint8)
+        interleaved[0::2] = shuffled[:half]
+        interleaved[1::2] = shuffled[half:]
+        # int16 arithmetic wraps around exactly like the encoding's did
+        np.cumsum(out, dtype=np.int16, out=out)
+
+    @classmethod
+    def build(cls, edf_path, chunk_samples=65536, level=6, block_sec=600) -> 'RawCache':
+        """
+        Converts the EDF at `edf_path` in one pass over its data records.
+        chunk_samples: samples per compressed chunk, the granularity of reads
+        level: zlib compression level
+        block_sec: seconds of data records read at once (bounds memory)
+        """
+        edf_index = EDFIndex.load(edf_path)
+        header = edf_index.index['header']
+        n_records = edf_index.get_n_records()
+        directory = cls.get_directory(edf_path)
+        tmp_directory = f"{directory}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+
+        channels = {}
+        files = {}
+        pending = {}
+        for i, ch in enumerate(edf_index.channels):
+            signal = edf_index.index['signals'][ch]
+            channels[ch] = {
+                'file': f"{i}.bin",
+                'freq': signal['freq'],
+                'n_samples': n_records * signal['samples_per_record'],
+                'gain': signal['gain'],
+                'offset': signal['offset'],
+                'scale': EDFIndex.get_unit_scale(signal['physical_dimension']),
+                'chunks': [],
+            }
+            files[ch] = open(f"{tmp_directory}/{i}.bin", 'wb')
+            pending[ch] = []
+
+        def flush(ch, final=False):
+            samples = np.concatenate(pending[ch]) if pending[ch] else np.empty(0, np.int16)
+            n_full = len(samples) if final else len(samples) // chunk_samples * chunk_samples
+            for start in range(0, n_full, chunk_samples):
+                chunk = cls.encode(samples[start:start + chunk_samples], level)
+                channels[ch]['chunks'].append([files[ch].tell(), len(chunk)])
+                files[ch].write(chunk)
+            pending[ch] = [samples[n_full:]]
+
+        try:
+            block_records = max(int(block_sec // header['record_duration']), 1)
+            if n_records:
+                data = np.memmap(edf_path, dtype='<i2', mode='r', offset=header['header_bytes'],
+                                 shape=(n_records, header['record_bytes'] // 2))
+                for r0 in range(0, n_records, block_records):
+                    block = np.asarray(data[r0:r0 + block_records])
+                    for ch in edf_index.channels:
+                        signal = edf_index.index['signals'][ch]
+                        first = signal['record_offset'] // 2
+                        pending[ch].append(block[:, first:first + signal['samples_per_record']].reshape(-1))
+                        flush(ch)
+                    report_progress(min(r0 + block_records, n_records) / n_records,
+                                    f"Compressing {os.path.basename(edf_path)}")
+                del data
+            for ch in edf_index.channels:
+                flush(ch, final=True)
+        finally:
+            for f in files.values():
+                f.close()
+
+        index = {
+            'version': cls.VERSION,
+            'file': EDFIndex.get_file_identity(edf_path),
+            'chunk_samples': chunk_samples,
+            'channels': channels,
+        }
+        # the index is written last, a directory without one is never read
+        with open(f"{tmp_directory}/{cls.INDEX_NAME}", 'w') as f:
+            json.dump(index, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_directory, directory)
+        return cls(directory, index)
+
+    @classmethod
+    def load(cls, edf_path) -> 'RawCache | None':
+        """
+        Returns the cache of the EDF at `edf_path`, or None if it has none
+        or the EDF changed since it was built
+        """
+        directory = cls.get_directory(edf_path)
+        try:
+            with open(f"{directory}/{cls.INDEX_NAME}") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return None
+        if index.get('version') != cls.VERSION or index.get('file') != EDFIndex.get_file_identity(edf_path):
+            return None
+        return cls(directory, index)
+
+    @staticmethod
+    def remove(edf_path) -> None:
+        shutil.rmtree(RawCache.get_directory(edf_path), ignore_errors=True)
+
+    def get_n_samples(self, channel) -> int:
+        return self.index['channels'][channel]['n_samples']
+
+    def get_size(self) -> int:
+        """
+        Bytes used on disk by the compressed samples
+        """
+        return sum(os.path.getsize(f"{self.directory}/{meta['file']}")
+                   for meta in self.index['channels'].values())
+
+    def read_digital(self, channel, start=0, stop=None) -> np.array:
+        """
+        Stored 16-bit samples [start, stop) of one channel
+        """
+        meta = self.index['channels'][channel]
+        chunk_samples = self.index['chunk_samples']
+        stop = meta['n_samples'] if stop is None else min(stop, meta['n_samples'])
+        start = max(start, 0)
+        if stop <= start:
+            return np.empty(0, dtype=np.int16)
+
+        first, last = start // chunk_samples, (stop - 1) // chunk_samples
+        chunks = meta['chunks'][first:last + 1]
+        with open(f"{self.directory}/{meta['file']}", 'rb') as f:
+            f.seek(chunks[0][0])
+            raw = f.read(chunks[-1][0] + chunks[-1][1] - chunks[0][0])
+        base = chunks[0][0]
+        origin = first * chunk_samples
+        samples = np.empty(min((last + 1) * chunk_samples, meta['n_samples']) - origin, dtype=np.int16)
+        for i, (offset, length) in enumerate(chunks):
+            self.decode(raw[offset - base:offset - base + length],
+                        samples[i * chunk_samples:(i + 1) * chunk_samples])
+        return samples[start - origin:stop - origin]
+
+    def read(self, channel, start=0, stop=None) -> np.array:
+        """
+        Samples [start, stop) of one channel in physical units, as returned by mne
+        """
+        meta = self.index['channels'][channel]
+        # same operations in the same order as mne, for identical floats
+        signal = self.read_digital(channel, start, stop) * meta['gain']
+        signal += meta['offset']
+        signal *= meta['scale']
+        return signal
@@ -3,6 +3,9 @@ from streamlit.runtime.uploaded_file_manager import UploadedFile
 import os
 import json
 import config as cfg
+from utils.AnalysisStore import AnalysisStore
+from utils.EDFIndex import EDFIndex
+from utils.RawCache import RawCache
 
 class SessionBase:
     @staticmethod
@@ -20,18 +23,11 @@ class SessionBase:
 
     @staticmethod
     def get_existing_analyses() -> list:
-        return os.listdir('filestore')
+        return AnalysisStore.get_existing_analyses()
     
     @staticmethod
     def get_edf_from_analysis(analysis: str, path=False) -> str | None:
-        if analysis in SessionBase.get_existing_analyses():
-            for file in os.listdir(f'{cfg.ANALYSIS_STORE}/{analysis}'):
-                ext = file.split('.')[-1].lower()
-                if ext == 'edf' and not path:
-                    return file
-                elif ext == 'edf' and path:
-                    return f"{cfg.ANALYSIS_STORE}/{analysis}/{file}"
-        return None
+        return AnalysisStore.get_edf_from_analysis(analysis, path=path)
 
     @staticmethod
     def initialize_session() -> None:
@@ -45,22 +41,45 @@ class SessionBase:
         for session_var in SESSION_VARS:
             if session_var not in st.session_state:
                 st.session_state[session_var] = None
+        # background jobs (see utils/Jobs.py) started by this session, by key
+        if 'jobs' not in st.session_state:
+            st.session_state['jobs'] = {}
 
     @staticmethod
-    def write_edf(file: UploadedFile, parent_dir):
+    def get_edfs_from_analysis(analysis: str, path=False) -> list:
+        return AnalysisStore.get_edfs_from_analysis(analysis, path=path)
+
+    @staticmethod
+    def write_edf(file: UploadedFile, parent_dir, append=False, cache=False):
+        """
+        Writes an uploaded EDF into the analysis directory, replacing any
+        existing EDF unless `append` is set, in which case it is added as
+        another segment of the recording.
+        cache: also write a compressed copy of the samples that is faster
+            to read back, see utils.RawCache
+        """
         session_dir = f'{cfg.ANALYSIS_STORE}/{parent_dir}'
         if parent_dir not in os.listdir(cfg.ANALYSIS_STORE):
             os.mkdir(session_dir)
 
-        existing_file = SessionBase.get_edf_from_analysis(parent_dir)
-        if existing_file is not None:
-            os.remove(f"{cfg.ANALYSIS_STORE}/{parent_dir}/{existing_file}")
+        for existing_file in SessionBase.get_edfs_from_analysis(parent_dir, path=True):
+            if append and not existing_file.endswith(f"/{file.name}"):
+                continue
+            os.remove(existing_file)
+            if os.path.isfile(EDFIndex.get_sidecar_path(existing_file)):
+                os.remove(EDFIndex.get_sidecar_path(existing_file))
+            RawCache.remove(existing_file)
 
         file_bytes = file.read()
         file_write_path = f'{session_dir}/{file.name}'
         with open(file_write_path, 'wb') as f:
             f.write(file_bytes)
 
+        EDFIndex.build(file_write_path).write()
+        if cache:
+            RawCache.build(file_write_path)
+        AnalysisStore.refresh_analysis(parent_dir)
+
     @staticmethod
     def write_configuration(config: dict, analysis, name):
         path = f"{cfg.ANALYSIS_STORE}/{analysis}/{name}"
@@ -0,0 +1,341 @@
+import os
+import re
+import json
+import warnings
+import numpy as np
+from datetime import datetime
+from utils.Channel import Channel
+
+
+class Spectrogram:
+    """
+    Time-frequency representation of a Channel computed once with batched
+    FFTs and stored on disk as compressed tiles of frames. Each tile file
+    holds `tile_frames` frames of power spectral density, and coarser zoom
+    levels average 2, 4, 8... neighbouring frames of the level below.
+    Band power, spectral edge frequency, spectral entropy and peak frequency
+    are derived from the stored tiles without touching the signal again.
+
+    Frames follow the same convention as Channel._apply_rolling: one frame
+    every `step_size` seconds centered on the sample, NaN where the window
+    runs over the edges of the recording.
+    """
+    META_NAME = 'meta.json'
+
+    def __init__(self, directory) -> None:
+        self.directory = directory
+        with open(f"{directory}/{self.META_NAME}") as f:
+            self.meta = json.load(f)
+        self.freqs = np.array(self.meta['freqs'])
+        self.start_ts = datetime.fromisoformat(self.meta['start_ts'])
+
+    @staticmethod
+    def get_directory(analysis_dir, channel_name) -> str:
+        safe_channel = re.sub(r'[^\w\-.]+', '_', channel_name)
+        return f"{analysis_dir}/spectrogram/{safe_channel}"
+
+    @staticmethod
+    def exists(directory, sources: list = None) -> bool:
+        """
+        Whether a spectrogram was computed in `directory`, and if `sources`
+        (see QualityMask.get_sources) is given, computed from those same EDF files
+        """
+        path = f"{directory}/{Spectrogram.META_NAME}"
+        if not os.path.isfile(path):
+            return False
+        if sources is None:
+            return True
+        try:
+            with open(path) as f:
+                return json.load(f).get('sources') == sources
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _psd_frames(frames, freq, segment_length, window) -> np.array:
+        """
+        Welch PSD (constant detrend, one-sided density) of each row of `frames`,
+        averaging half-overlapping segments of `segment_length` samples.
+        """
+        step = segment_length // 2
+        n_segments = (frames.shape[1] - segment_length) // step + 1
+        scale = 1.0 / (freq * (window**2).sum())
+        psd = 0
+        for k in range(n_segments):
+            segment = frames[:, k*step:k*step + segment_length]
+            segment = segment - segment.mean(axis=1, keepdims=True)
+            psd = psd + np.abs(np.fft.rfft(segment * window, axis=1))**2
+        psd = psd * scale / n_segments
+        psd[:, 1:-1 if segment_length % 2 == 0 else None] *= 2
+        return psd
+
+    @classmethod
+    def compute(cls, channel: Channel, directory, window_sec=2, step_size=1, segment_sec=None,
+                fmax=None, tile_frames=3600, levels=None, batch_frames=2048, sources: list = None) -> 'Spectrogram':
+        """
+        Computes the spectrogram of a channel and writes it as tiles to `directory`.
+        window_sec: window size in seconds of each frame
+        step_size: step between frames in seconds
+        segment_sec: Welch segment length within a frame (default: the whole window)
+        fmax: highest frequency to keep, defaults to Nyquist
+        tile_frames: number of frames stored per tile file
+        levels: number of zoom levels, by default until a level fits in one tile
+        batch_frames: number of frames transformed per FFT batch (bounds memory)
+        sources: identity of the EDF files the channel was read from (see
+            QualityMask.get_sources), checked by exists
+        """
+        window_length = int(window_sec * channel.freq)
+        segment_length = int((segment_sec or window_sec) * channel.freq)
+        step_idx = int(step_size * channel.freq)
+        # periodic Hann window, as used by scipy.signal.welch
+        window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(segment_length) / segment_length)
+        freqs = np.fft.rfftfreq(segment_length, 1 / channel.freq)
+        keep = freqs <= fmax if fmax else np.ones(len(freqs), dtype=bool)
+        freqs = freqs[keep]
+
+        signal = np.asarray(channel.signal, dtype=np.float64)
+        time = np.asarray(channel.time)
+        centers = np.arange(0, len(signal), step_idx)
+        frame_length = 2 * (window_length // 2)
+        starts = centers - window_length // 2
+        valid = (starts >= 0) & (starts + frame_length <= len(signal))
+        views = np.lib.stride_tricks.sliding_window_view(signal, frame_length) \
+            if len(signal) >= frame_length else np.empty((0, frame_length))
+
+        if levels is None:
+            levels = max(1, int(np.ceil(np.log2(max(len(centers) / tile_frames, 1)))) + 1)
+        os.makedirs(directory, exist_ok=True)
+        writer = _TileWriter(directory, 0, levels, tile_frames)
+        # frames are transformed and written a batch at a time so the full
+        # spectrogram is never held in memory
+        for b in range(0, len(centers), batch_frames):
+            idx = np.arange(b, min(b + batch_frames, len(centers)))
+            psd = np.full((len(idx), len(freqs)), np.nan, dtype=np.float32)
+            batch_valid = valid[idx]
+            if batch_valid.any():
+                frames = views[starts[idx[batch_valid]]]
+                psd[batch_valid] = cls._psd_frames(frames, channel.freq, segment_length, window)[:, keep]
+            writer.push(time[centers[idx]], psd)
+        n_frames = writer.close()
+
+        meta = {
+            'name': channel.name,
+            'start_ts': channel.start_ts.isoformat(),
+            'freq': channel.freq,
+            'window_sec': window_sec,
+            'step_size': step_size,
+            'segment_sec': segment_sec or window_sec,
+            'freqs': freqs.tolist(),
+            'tile_frames': tile_frames,
+            'n_frames': n_frames,
+            'sources': sources,
+        }
+        with open(f"{directory}/{cls.META_NAME}", 'w') as f:
+            json.dump(meta, f)
+        return cls(directory)
+
+    @property
+    def levels(self) -> int:
+        return len(self.meta['n_frames'])
+
+    def get_level_step(self, level) -> float:
+        return self.meta['step_size'] * 2**level
+
+    def choose_level(self, start_sec, end_sec, max_frames=2000) -> int:
+        """
+        Finest zoom level that shows the time range in at most max_frames frames
+        """
+        for level in range(self.levels):
+            if (end_sec - start_sec) / self.get_level_step(level) <= max_frames:
+                return level
+        return self.levels - 1
+
+    def iter_tiles(self, level=0):
+        """
+        Yields (time, psd) for each tile of a level in time order
+        """
+        tile_frames = self.meta['tile_frames']
+        n_tiles = int(np.ceil(self.meta['n_frames'][level] / tile_frames))
+        for t in range(n_tiles):
+            with np.load(f"{self.directory}/L{level}_T{t:05d}.npz") as tile:
+                yield tile['time'], tile['psd']
+
+    def read(self, start_sec=None, end_sec=None, level=0) -> tuple:
+        """
+        Returns (time, freqs, psd) for the frames of a level within
+        [start_sec, end_sec], loading only the tiles that overlap it.
+        Times are seconds from the start of the recording.
+        """
+        tile_frames = self.meta['tile_frames']
+        step = self.get_level_step(level)
+        n_frames = self.meta['n_frames'][level]
+        with np.load(f"{self.directory}/L{level}_T00000.npz") as tile:
+            first_time = tile['time'][0] if len(tile['time']) else 0.0
+
+        first = 0 if start_sec is None else max(0, int((start_sec - first_time) // step) - 1)
+        last = n_frames if end_sec is None else min(n_frames, int((end_sec - first_time) // step) + 2)
+        times, psds = [], []
+        for t in range(first // tile_frames, int(np.ceil(last / tile_frames))):
+            with np.load(f"{self.directory}/L{level}_T{t:05d}.npz") as tile:
+                times.append(tile['time'])
+                psds.append(tile['psd'])
+        if not times:
+            return np.array([]), self.freqs, np.empty((0, len(self.freqs)))
+        time, psd = np.concatenate(times), np.vstack(psds)
+        mask = np.ones(len(time), dtype=bool)
+        if start_sec is not None:
+            mask &= time >= start_sec
+        if end_sec is not None:
+            mask &= time <= end_sec
+        return time[mask], self.freqs, psd[mask]
+
+    def _band_mask(self, freq_range) -> np.array:
+        if freq_range is None:
+            return np.ones(len(self.freqs), dtype=bool)
+        return (self.freqs >= freq_range[0]) & (self.freqs <= freq_range[1])
+
+    def _derive(self, name, process, level=0) -> Channel:
+        """
+        Applies `process` to the PSD of every tile, returns the per-frame
+        result as a Channel at the frame rate
+        """
+        times, values = [], []
+        for time, psd in self.iter_tiles(level):
+            times.append(time)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values.append(process(psd.astype(np.float64)))
+        freq = 1 / self.get_level_step(level)
+        return Channel(
+            start_ts=self.start_ts,
+            name=f"{self.meta['name']}.{name}",
+            signal=np.concatenate(values),
+            time=np.concatenate(times),
+            freq=int(freq) if float(freq).is_integer() else freq
+        )
+
+    def get_band_power(self, freq_range=(0.5, 4), ref_power=1e-13, in_dB=True, level=0) -> Channel:
+        """
+        Power in freq_range (trapezoidal integral of the PSD) per frame
+        freq_range: range of frequencies in form of (lower, upper)
+        ref_power: reference power to divide by (used for scaling)
+        in_dB: boolean for whether to convert the output into decibals
+        """
+        from scipy.integrate import trapezoid
+
+        band = self._band_mask(freq_range)
+
+        def band_power(psd):
+            power = trapezoid(psd[:, band], self.freqs[band], axis=1) / ref_power
+            return 10 * np.log10(power) if in_dB else power
+        return self._derive('band_power', band_power, level)
+
+    def get_spectral_edge(self, edge=0.95, freq_range=None, level=0) -> Channel:
+        """
+        Frequency below which `edge` of the power within freq_range lies
+        """
+        band = self._band_mask(freq_range)
+        freqs = self.freqs[band]
+
+        def spectral_edge(psd):
+            cumulative = np.cumsum(psd[:, band], axis=1)
+            total = cumulative[:, -1:]
+            idx = (cumulative < edge * total).sum(axis=1)
+            result = freqs[np.minimum(idx, len(freqs) - 1)]
+            return np.where(np.isnan(total[:, 0]), np.nan, result)
+        return self._derive('spectral_edge', spectral_edge, level)
+
+    def get_spectral_entropy(self, freq_range=None, normalize=True, level=0) -> Channel:
+        """
+        Shannon entropy of the PSD within freq_range treated as a distribution
+        normalize: divide by log2 of the number of bins so the result is within [0, 1]
+        """
+        band = self._band_mask(freq_range)
+
+        def spectral_entropy(psd):
+            p = psd[:, band] / psd[:, band].sum(axis=1, keepdims=True)
+            entropy = -np.nansum(np.where(p > 0, p * np.log2(p), 0), axis=1)
+            entropy[np.isnan(p).any(axis=1)] = np.nan
+            return entropy / np.log2(band.sum()) if normalize else entropy
+        return self._derive('spectral_entropy', spectral_entropy, level)
+
+    def get_peak_frequency(self, freq_range=None, level=0) -> Channel:
+        """
+        Frequency of maximum power within freq_range
+        """
+        band = self._band_mask(freq_range)
+        freqs = self.freqs[band]
+
+        def peak_frequency(psd):
+            psd = psd[:, band]
+            nan_rows = np.isnan(psd).all(axis=1)
+            idx = np.argmax(np.nan_to_num(psd, nan=-np.inf), axis=1)
+            return np.where(nan_rows, np.nan, freqs[idx])
+        return self._derive('peak_frequency', peak_frequency, level)
+
+
+class _TileWriter:
+    """
+    Writes the frames of one zoom level to tile files as they arrive and
+    forwards pairwise frame averages to the writer of the next level.
+    """
+    def __init__(self, directory, level, levels, tile_frames) -> None:
+        self.directory = directory
+        self.level = level
+        self.tile_frames = tile_frames
+        self.next = _TileWriter(directory, level + 1, levels, tile_frames) \
+            if level + 1 < levels else None
+        self.times, self.psds = [], []
+        self.buffered = 0
+        self.tiles = 0
+        self.frames = 0
+        self.carry = None
+
+    def push(self, time, psd) -> None:
+        self.times.append(time)
+        self.psds.append(psd)
+        self.buffered += len(time)
+        self.frames += len(time)
+        while self.buffered >= self.tile_frames:
+            self._flush(self.tile_frames)
+        if self.next is not None:
+            self._forward(time, psd)
+
+    def _forward(self, time, psd) -> None:
+        if self.carry is not None:
+            time = np.concatenate([self.carry[0], time])
+            psd = np.vstack([self.carry[1], psd])
+            self.carry = None
+        n = len(time) // 2 * 2
+        if n < len(time):
+            self.carry = (time[n:], psd[n:])
+        if n:
+            with warnings.catch_warnings():
+                # all-NaN pairs at the recording edges stay NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                coarse = np.nanmean(psd[:n].reshape(n // 2, 2, -1), axis=1)
+            self.next.push(time[:n].reshape(-1, 2).mean(axis=1), coarse.astype(np.float32))
+
+    def _flush(self, count) -> None:
+        time, psd = np.concatenate(self.times), np.vstack(self.psds)
+        np.savez_compressed(
+            f"{self.directory}/L{self.level}_T{self.tiles:05d}.npz",
+            psd=psd[:count],
+            time=time[:count]
+        )
+        self.tiles += 1
+        self.times, self.psds = [time[count:]], [psd[count:]]
+        self.buffered -= count
+
+    def close(self) -> list:
+        """
+        Writes the remaining partial tile, returns the frame count of this
+        level and all coarser ones
+        """
+        if self.buffered:
+            self._flush(self.buffered)
+        if self.next is None:
+            return [self.frames]
+        if self.carry is not None:
+            self.next.push(*self.carry)
+            self.carry = None
+        return [self.frames] + self.next.close()